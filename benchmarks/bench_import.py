@@ -0,0 +1,48 @@
+"""
+benchmark of the import time of each dstools module
+(each module is imported in a fresh interpreter)
+"""
+import os
+import sys
+import pkgutil
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import dstools  # noqa
+
+
+def import_time(module, repeat=3):
+    """
+    returns the minimum time in seconds to import the given module
+    """
+    code = (
+        "import time; start = time.perf_counter(); import {}; "
+        "print(time.perf_counter() - start)".format(module)
+    )
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        if out.returncode != 0:
+            return None
+        times.append(float(out.stdout))
+
+    return min(times)
+
+
+def main():
+    for module in pkgutil.iter_modules(dstools.__path__):
+        name = "dstools.{}".format(module.name)
+        seconds = import_time(name)
+        print("{:>22}: {}".format(
+            name, "failed" if seconds is None else "{:8.3f}s".format(seconds)
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+benchmark of the corpus normalization at different numbers of
+worker processes
+"""
+import os
+import sys
+import time
+import random
+import string
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dstools.nlp import normalize_corpus  # noqa
+
+
+def generate_documents(no_documents=20000, words_per_document=50, seed=0):
+    """
+    returns synthetic documents drawn from a small, repetitive vocabulary
+    """
+    rnd = random.Random(seed)
+    vocabulary = [
+        "".join(rnd.choice(string.ascii_letters) for _ in range(7))
+        for _ in range(3000)
+    ] + ["The", "<b>bold</b>", "42", "naïve", "end."]
+
+    return [
+        rnd.choices(vocabulary, k=words_per_document)
+        for _ in range(no_documents)
+    ]
+
+
+def main():
+    documents = generate_documents()
+    for no_processes in (1, 2, 4, 8):
+        start = time.perf_counter()
+        for _ in normalize_corpus(
+            documents, no_processes=no_processes,
+            stemmer_class=None, lemmatize_pos=None
+        ):
+            pass
+        print("{} processes: {:8.3f}s".format(
+            no_processes, time.perf_counter() - start
+        ))
+
+
+if __name__ == "__main__":
+    main()
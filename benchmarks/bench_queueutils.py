@@ -0,0 +1,59 @@
+"""
+benchmark comparing the thread and the process backend of the
+worker queues on CPU-bound and I/O-bound work
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dstools.queueutils import ThreadedWorkerQueue, ProcessWorkerQueue  # noqa
+
+
+def cpu_bound(n):
+    """
+    pure python arithmetic holding the GIL
+    """
+    return sum(i * i for i in range(n))
+
+
+def io_bound(seconds):
+    """
+    sleep releasing the GIL (stand-in for I/O)
+    """
+    time.sleep(seconds)
+
+
+def run(queue_class, process_func, items, **kwargs):
+    """
+    returns the seconds needed to process all items
+    """
+    start = time.perf_counter()
+    q = queue_class(process_func, **kwargs)
+    for item in items:
+        q.put(item)
+    q.join()
+
+    return time.perf_counter() - start
+
+
+def main(workers=4):
+    cases = [
+        ("cpu", cpu_bound, [20000] * 2000),
+        ("io", io_bound, [0.001] * 2000),
+    ]
+    for name, func, items in cases:
+        threads = run(ThreadedWorkerQueue, func, items, no_threads=workers)
+        processes = run(
+            ProcessWorkerQueue, func, items, no_processes=workers
+        )
+        print(
+            "{:>4}: threads {:8.3f}s  processes {:8.3f}s".format(
+                name, threads, processes
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
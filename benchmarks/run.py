@@ -0,0 +1,379 @@
+"""
+benchmark suite for the dstools hot paths
+
+all data is generated synthetically in a temporary directory; the
+results are written as JSON so that two runs can be compared:
+
+    python benchmarks/run.py -o before.json
+    python benchmarks/run.py -o after.json
+    python benchmarks/run.py --compare before.json after.json
+"""
+import os
+import sys
+import bz2
+import gzip
+import json
+import time
+import random
+import string
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import collections
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa
+
+# registered benchmarks: name => function(tmpdir) returning (func, items)
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name):
+    """
+    decorator registering a benchmark setup function, which prepares the
+    data and returns the function to time and its number of items
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def random_words(rnd, n, vocabulary_size=2000):
+    """
+    returns n words drawn from a repetitive random vocabulary
+    """
+    vocabulary = [
+        "".join(rnd.choice(string.ascii_letters) for _ in range(6))
+        for _ in range(vocabulary_size)
+    ]
+    return rnd.choices(vocabulary, k=n)
+
+
+def write_text_file(tmpdir, ext, no_lines=100000):
+    """
+    writes a synthetic text file (plain, gz or bz2) and returns its name
+    """
+    filename = os.path.join(tmpdir, "lines.txt{}".format(ext))
+    if os.path.exists(filename):
+        return filename
+
+    words = random_words(random.Random(0), 10 * no_lines, 100)
+    data = "".join(
+        "{}\n".format(" ".join(words[i:i + 10]))
+        for i in range(0, len(words), 10)
+    ).encode("utf-8")
+
+    opener = {"": open, ".gz": gzip.open, ".bz2": bz2.open}[ext]
+    with opener(filename, "wb") as f:
+        f.write(data)
+
+    return filename
+
+
+# ---------- osutils ----------
+def _linewise(ext):
+    def setup(tmpdir):
+        from dstools.osutils import get_linewise
+
+        filename = write_text_file(tmpdir, ext)
+        return lambda: sum(1 for _ in get_linewise(filename)), 100000
+
+    return setup
+
+
+def _blocks(ext):
+    def setup(tmpdir):
+        from dstools.osutils import get_blocks
+
+        filename = write_text_file(tmpdir, ext)
+        size = os.path.getsize(write_text_file(tmpdir, ""))
+        return (
+            lambda: sum(1 for _ in get_blocks(filename, chunk_size=65536)),
+            size
+        )
+
+    return setup
+
+
+for _ext in ("", ".gz", ".bz2"):
+    _name = _ext.lstrip(".") or "plain"
+    benchmark("osutils.get_linewise[{}]".format(_name))(_linewise(_ext))
+    benchmark("osutils.get_blocks[{}]".format(_name))(_blocks(_ext))
+
+
+# ---------- libsvmformat ----------
+@benchmark("libsvmformat.get_libsvm_format")
+def bench_libsvm_format(tmpdir):
+    from dstools.libsvmformat import get_libsvm_format
+
+    rnd = random.Random(0)
+    filename = os.path.join(tmpdir, "data.libsvm")
+    with open(filename, "w") as f:
+        for _ in range(20000):
+            features = sorted(rnd.sample(range(1, 1000), 20))
+            f.write("{} {}\n".format(rnd.choice((-1, 1)), " ".join(
+                "{}:{:.4f}".format(k, rnd.random()) for k in features
+            )))
+
+    return lambda: get_libsvm_format(filename), 20000
+
+
+@benchmark("libsvmformat.get_libsvm_pred")
+def bench_libsvm_pred(tmpdir):
+    from dstools.libsvmformat import get_libsvm_pred
+
+    rnd = random.Random(0)
+    filename = os.path.join(tmpdir, "data.pred")
+    with open(filename, "w") as f:
+        for _ in range(100000):
+            f.write("{},{:.6f}\n".format(rnd.choice((-1, 1)), rnd.random()))
+
+    return lambda: get_libsvm_pred(filename), 100000
+
+
+# ---------- dejavu ----------
+@benchmark("dejavu.DejaVu.seen")
+def bench_dejavu(tmpdir):
+    from dstools.dejavu import DejaVu
+
+    items = random_words(random.Random(0), 200000, 50000)
+
+    def run():
+        d = DejaVu()
+        for item in items:
+            d.seen(item)
+
+    return run, len(items)
+
+
+# ---------- datetimebin ----------
+@benchmark("datetimebin.DateTimeBin.__setitem__")
+def bench_datetimebin(tmpdir):
+    from dstools.datetimebin import DateTimeBin
+
+    start = datetime.datetime(2020, 1, 1)
+    rnd = random.Random(0)
+    items = [
+        (start + datetime.timedelta(seconds=rnd.randrange(86400)),
+         rnd.choice("abcdefgh"))
+        for _ in range(20000)
+    ]
+
+    def run():
+        b = DateTimeBin(
+            start, start + datetime.timedelta(days=1),
+            datetime.timedelta(minutes=15)
+        )
+        for dt, value in items:
+            b[dt] = value
+
+    return run, len(items)
+
+
+# ---------- rawfile ----------
+@benchmark("rawfile.RawFile.write[gzip]")
+def bench_rawfile(tmpdir):
+    from dstools.rawfile import RawFile
+
+    path = os.path.join(tmpdir, "raw")
+    os.makedirs(path, exist_ok=True)
+    lines = [
+        "{}\n".format(" ".join(words)).encode("utf-8")
+        for words in zip(*[iter(random_words(random.Random(0), 500000))] * 10)
+    ]
+
+    def run():
+        f = RawFile(path, "bench", "gz", max_size_mb=1)
+        for line in lines:
+            f.write(line)
+        f.finalize()
+
+    return run, len(lines)
+
+
+# ---------- queueutils ----------
+@benchmark("queueutils.ThreadedWorkerQueue")
+def bench_worker_queue(tmpdir):
+    from dstools.queueutils import ThreadedWorkerQueue
+
+    def run():
+        q = ThreadedWorkerQueue(lambda item: item * 2, no_threads=4)
+        for item in range(50000):
+            q.put(item)
+        q.join()
+
+    return run, 50000
+
+
+# ---------- nlp ----------
+@benchmark("nlp.normalize")
+def bench_normalize(tmpdir):
+    from dstools.nlp import normalize
+
+    rnd = random.Random(0)
+    documents = [
+        random_words(rnd, 50, 3000) + ["<b>The</b>", "42", "naïve,"]
+        for _ in range(200)
+    ]
+    stopwords = {"the", "a", "of", "and"}
+
+    def run():
+        for words in documents:
+            normalize(words, stopwords=stopwords)
+
+    return run, sum(len(words) for words in documents)
+
+
+# ---------- flatten ----------
+@benchmark("flatten.flatten_dict")
+def bench_flatten(tmpdir):
+    from dstools.flatten import flatten_dict
+
+    rnd = random.Random(0)
+    documents = [
+        {
+            "id": no,
+            "user": {"name": rnd.choice("abc"), "tags": ["x", "y", "z"]},
+            "payload": {
+                "values": [rnd.random() for _ in range(10)],
+                "meta": {"a": {"b": {"c": no}}},
+            },
+        }
+        for no in range(20000)
+    ]
+    key_filter = ["id", "user.name", "payload.meta.a.b.c"]
+
+    def run():
+        for document in documents:
+            flatten_dict(document)
+            flatten_dict(document, key_filter)
+
+    return run, len(documents)
+
+
+# ---------- roc ----------
+@benchmark("roc.RocCurve")
+def bench_roc(tmpdir):
+    from dstools.roc import RocCurve
+
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, 1000000)
+    scores = rng.normal(size=len(labels)) + labels
+
+    def run():
+        roc = RocCurve(labels, scores)
+        roc.auc()
+        roc.auc(0.1)
+
+    return run, len(labels)
+
+
+def run_benchmarks(names, repeat, tmpdir):
+    """
+    runs the given benchmarks and returns their results
+    """
+    results = collections.OrderedDict()
+    for name in names:
+        try:
+            func, items = BENCHMARKS[name](tmpdir)
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+
+        except Exception as e:
+            print("{:<42} ERROR: {}".format(name, e))
+            results[name] = {"error": str(e)}
+            continue
+
+        best = min(times)
+        results[name] = {
+            "min": best,
+            "median": float(np.median(times)),
+            "repeat": repeat,
+            "items": items,
+            "items_per_second": items / best if best > 0 else None,
+        }
+        print("{:<42} {:10.4f}s {:14.0f} items/s".format(
+            name, best, results[name]["items_per_second"] or 0
+        ))
+
+    return results
+
+
+def compare(before_filename, after_filename):
+    """
+    prints the speedup of the benchmarks of two result files
+    """
+    with open(before_filename) as f:
+        before = json.load(f)["results"]
+    with open(after_filename) as f:
+        after = json.load(f)["results"]
+
+    for name in after:
+        if ("min" not in after[name]) or ("min" not in before.get(name, {})):
+            print("{:<42} {:>10}".format(name, "n/a"))
+            continue
+
+        print("{:<42} {:10.4f}s -> {:10.4f}s  x{:.2f}".format(
+            name, before[name]["min"], after[name]["min"],
+            before[name]["min"] / after[name]["min"]
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "-o", "--output", help="write the results to the given JSON file"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3,
+        help="number of repetitions per benchmark"
+    )
+    parser.add_argument(
+        "-k", "--filter", default="",
+        help="only run the benchmarks containing the given string"
+    )
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+        help="compare two result files"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="list the benchmarks"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return
+
+    tmpdir = tempfile.mkdtemp(prefix="dstools_bench_")
+    try:
+        results = run_benchmarks(names, args.repeat, tmpdir)
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": datetime.datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
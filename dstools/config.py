@@ -1,20 +1,49 @@
+import io
 import os
 import sys
+import types
+import logging
+import threading
+import collections
 import configparser
 
 
+# logger
+log = logging.getLogger(__name__)
+
+# config parser and the immutable mapping of its typed values
+ConfigSnapshot = collections.namedtuple("ConfigSnapshot", "config values")
+
+
 class Config(object):
     """
     config object for a simplified handling of config files
+
+    the typed values are cached in an immutable snapshot after loading;
+    if auto_reload is set, the file's mtime is checked every
+    reload_interval seconds by a background thread and a changed file is
+    loaded into a new snapshot that replaces the old one atomically
+    (writers are serialized by a lock, readers never block); values that
+    cannot be cast to their type are logged and kept as str
     """
-    def __init__(self, filename, defaults=[], create_member_variables=False):
+    def __init__(
+        self, filename, defaults=[], create_member_variables=False,
+        auto_reload=False, reload_interval=1.0
+    ):
         self.filename = os.path.expanduser(filename)
-        self.config = configparser.SafeConfigParser()
+        self._snapshot = ConfigSnapshot(
+            configparser.ConfigParser(), types.MappingProxyType({})
+        )
         self._defaults_types = {
-            "{}#{}".format(item[0], item[1]): item[3]
+            (item[0], self.config.optionxform(item[1])): item[3]
             for item in defaults
             if len(item) == 4
         }
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._reload_interval = reload_interval
+        self._stop_reload = threading.Event()
+        self._reload_thread = None
 
         if os.path.exists(self.filename):
             # load config from file, if it is existing
@@ -33,6 +62,9 @@ class Config(object):
                 )
             )
 
+        if auto_reload is True:
+            self.start_auto_reload()
+
     def _create_member_variables(self):
         """
         reads values of all sections from the config file
@@ -42,7 +74,7 @@ class Config(object):
             for k, v in self.config.items(section):
                 if getattr(self, k, None) is None:
                     # new key => create member variable
-                    setattr(self, k, self.get_type(section, k)(v))
+                    setattr(self, k, self._cast(section, k, v))
 
                 else:
                     raise ValueError(
@@ -55,33 +87,106 @@ class Config(object):
         set a value in the config file in the given section
         under the given key
         """
-        if not self.config.has_section(section):
-            self.config.add_section(section)
-        self.config.set(section, key, value)
+        with self._lock:
+            config = self._copy_config()
+            self._set(config, section, key, value)
+            self._update_snapshot(config)
+
+    def _copy_config(self):
+        """
+        returns a copy of the current config parser, which can be
+        modified without changing the current snapshot
+        """
+        f = io.StringIO()
+        self.config.write(f)
+        config = configparser.ConfigParser()
+        config.read_string(f.getvalue())
+
+        return config
+
+    @staticmethod
+    def _set(config, section, key, value):
+        """
+        set a value in the given config parser
+        """
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, key, value)
 
     def get(self, section, key, type_=None):
         """
         get a value from a section by given key
         (type_ can be specified for cast)
         """
+        config, values = self._snapshot
+
+        if type_ is None:
+            # cached value, cast to the type from defaults
+            return values.get((section, config.optionxform(key)))
+
         if (
-            not self.config.has_section(section) or
-            not self.config.has_option(section, key)
+            not config.has_section(section) or
+            not config.has_option(section, key)
         ):
             return None
 
-        if type_ is None:
-            # if not type proved, get type from defaults
-            type_ = self.get_type(section, key)
-
-        return type_(self.config.get(section, key))
+        return type_(config.get(section, key))
 
     def get_type(self, section, key):
         """
         returns the type of the given config item,
         if defined in the defaults; if not defined retur str
         """
-        return self._defaults_types.get("{}#{}".format(section, key), str)
+        return self._defaults_types.get(
+            (section, self.config.optionxform(key)), str
+        )
+
+    @property
+    def config(self):
+        """
+        returns the config parser of the current snapshot
+        """
+        return self._snapshot.config
+
+    @config.setter
+    def config(self, config):
+        self._update_snapshot(config)
+
+    @property
+    def snapshot(self):
+        """
+        returns the current immutable mapping of (section, key)
+        to the typed value
+        """
+        return self._snapshot.values
+
+    def _cast(self, section, key, value):
+        """
+        cast the given value to the type of the config item; values
+        that cannot be cast are logged and returned as str
+        """
+        try:
+            return self.get_type(section, key)(value)
+
+        except (TypeError, ValueError):
+            log.warning("cannot cast '{}' of [{}] {}, keeping str".format(
+                value, section, key
+            ))
+            return value
+
+    def _update_snapshot(self, config):
+        """
+        cast all values of the given config parser and replace the
+        snapshot (and the config parser) at once
+        """
+        with self._lock:
+            values = types.MappingProxyType({
+                (section, k): self._cast(section, k, v)
+                for section in config.sections()
+                for k, v in config.items(section)
+            })
+
+            self._snapshot = ConfigSnapshot(config, values)
 
     def save(self):
         """
@@ -94,15 +199,76 @@ class Config(object):
         """
         load the config from the config file
         """
-        self.config.read(self.filename)
+        with self._lock:
+            config = configparser.ConfigParser()
+            self._mtime = os.path.getmtime(self.filename)
+            config.read(self.filename)
+            self._update_snapshot(config)
+
+    def reload_if_changed(self):
+        """
+        load the config file again, if its mtime has changed;
+        returns True, if reloaded
+        """
+        try:
+            with self._lock:
+                if os.path.getmtime(self.filename) == self._mtime:
+                    return False
+
+                self.load()
+
+        except (OSError, configparser.Error):
+            # keep the current snapshot
+            log.exception("reloading '{}' failed".format(self.filename))
+            return False
+
+        log.debug("reloaded config '{}'".format(self.filename))
+        return True
+
+    def start_auto_reload(self):
+        """
+        start the background thread that reloads the changed config file
+        """
+        if self._reload_thread is not None:
+            return
+
+        self._stop_reload.clear()
+        self._reload_thread = threading.Thread(target=self._auto_reload)
+        self._reload_thread.daemon = True
+        self._reload_thread.start()
+
+    def stop_auto_reload(self):
+        """
+        stop the background reload thread
+        """
+        if self._reload_thread is None:
+            return
+
+        self._stop_reload.set()
+        self._reload_thread.join()
+        self._reload_thread = None
+
+    def _auto_reload(self):
+        """
+        called by the reload thread to check the config file periodically
+        """
+        while not self._stop_reload.wait(self._reload_interval):
+            self.reload_if_changed()
 
     def set_defaults(self, defaults, save=True):
         """
         sets given list of (section, key, value) triples as defaults
         """
-        for item in defaults:
-            if self.get(item[0], item[1]) is None:
-                self.set(item[0], item[1], item[2])
+        with self._lock:
+            # copy the config only once for all defaults
+            config = self._copy_config()
+            for item in defaults:
+                if not (
+                    config.has_section(item[0]) and
+                    config.has_option(item[0], item[1])
+                ):
+                    self._set(config, item[0], item[1], item[2])
+            self._update_snapshot(config)
 
         if save:
             self.save()
@@ -1,4 +1,7 @@
 import collections
+
+import numpy as np
+
 from .utils import pairwise
 
 
@@ -31,6 +34,11 @@ class DateTimeBin(object):
         for dt_tuple in pairwise(daterange(start_ts, end_ts, step_delta)):
             self.bins[dt_tuple] = collections.Counter()
 
+        # columnar count matrix (bins x values) mirroring the counters,
+        # the columns are assigned in order of first appearance
+        self._value_index = collections.OrderedDict()
+        self._counts = np.zeros((len(self.bins), 8), dtype=np.int64)
+
     @property
     def values(self):
         return self._values
@@ -83,9 +91,62 @@ class DateTimeBin(object):
         # update value set to keep track of all set values
         self._values.update([value, ])
 
-    def __str__(self):
-        tmp = ""
-        for k, v in list(self.bins.items()):
-            tmp += "%s - %s => %s\n" % (k[0], k[1], v)
+        # update the columnar count matrix
+        col = self._get_column(value)
+        self._counts[no, col] += 1
+
+    def _get_column(self, value):
+        """
+        returns the column of the given value in the count matrix,
+        new values get a new column (the matrix is grown if required)
+        """
+        col = self._value_index.get(value)
+        if col is None:
+            col = len(self._value_index)
+            self._value_index[value] = col
+
+            if col >= self._counts.shape[1]:
+                # double the number of columns
+                self._counts = np.hstack(
+                    (self._counts, np.zeros_like(self._counts))
+                )
+
+        return col
+
+    def to_numpy(self, values=None):
+        """
+        returns the counts as (bins x values) matrix; if no values
+        are given, the columns are in order of first appearance
+        """
+        if values is None:
+            return self._counts[:, :len(self._value_index)].copy()
+
+        # select requested columns, unknown values have zero counts
+        counts = np.hstack(
+            (self._counts, np.zeros((len(self.bins), 1), dtype=np.int64))
+        )
+        missing = counts.shape[1] - 1
+        return counts[:, [self._value_index.get(v, missing) for v in values]]
+
+    def to_frame(self, values=None):
+        """
+        returns the counts as pandas DataFrame with the bins' start
+        dates as DatetimeIndex and the values as columns
+        """
+        # pandas is only required for this export
+        import pandas as pd
 
-        return tmp
+        if values is None:
+            values = list(self._value_index.keys())
+
+        return pd.DataFrame(
+            self.to_numpy(values),
+            index=pd.DatetimeIndex(list(self.start_dates())),
+            columns=values
+        )
+
+    def __str__(self):
+        return "".join(
+            "%s - %s => %s\n" % (k[0], k[1], v)
+            for k, v in self.bins.items()
+        )
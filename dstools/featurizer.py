@@ -0,0 +1,129 @@
+import zlib
+import itertools
+import collections
+
+import numpy as np
+import scipy.sparse as sp
+
+from .utils import ngram
+from .libsvmformat import create_sparse_libsvmline
+
+
+class HashingFeaturizer:
+    """
+    streaming featurizer that hashes the word n-grams and the character
+    n-grams of normalized documents into a fixed size feature space,
+    so that no vocabulary needs to be built
+
+    documents are either strings (tokenized by whitespace) or lists of
+    words; if no normalizer is given, nlp.Normalizer() is used (set
+    normalizer to False to skip the normalization)
+    """
+    def __init__(
+        self, n_features=2**20, word_ngrams=(1, 1), char_ngrams=None,
+        normalizer=None, binary=False, alternate_sign=False
+    ):
+        self.n_features = n_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+        self.binary = binary
+        self.alternate_sign = alternate_sign
+        self._normalizer = normalizer
+
+    @property
+    def normalizer(self):
+        if self._normalizer is None:
+            # create default normalizer on first use
+            from .nlp import Normalizer
+
+            self._normalizer = Normalizer()
+
+        return self._normalizer
+
+    def tokenize(self, document):
+        """
+        returns the normalized words of the given document
+        """
+        if isinstance(document, str):
+            document = document.split()
+
+        if self._normalizer is False:
+            return list(document)
+
+        return self.normalizer(document)
+
+    def ngrams(self, words):
+        """
+        generator of the prefixed word and character n-grams of the words
+        """
+        if self.word_ngrams is not None:
+            lo, hi = self.word_ngrams
+            for n in range(lo, hi + 1):
+                for i in range(len(words) - n + 1):
+                    yield "w:" + " ".join(words[i:i + n])
+
+        if self.char_ngrams is not None:
+            lo, hi = self.char_ngrams
+            for word in words:
+                # pad words to mark their start and their end
+                word = " {} ".format(word)
+                for n in range(lo, hi + 1):
+                    for gram in ngram(word, n):
+                        yield "c:" + gram
+
+    def features(self, document):
+        """
+        returns a dictionary of (feature index, value) pairs
+        of the given document
+        """
+        counts = collections.Counter()
+        n_features = self.n_features
+        for gram in self.ngrams(self.tokenize(document)):
+            # crc32 is stable across processes (unlike hash())
+            h = zlib.crc32(gram.encode("utf-8"))
+            sign = -1 if self.alternate_sign and (h & 0x80000000) else 1
+            counts[h % n_features] += sign
+
+        if self.binary:
+            return {k: 1 if v > 0 else -1 for k, v in counts.items() if v != 0}
+
+        return {k: v for k, v in counts.items() if v != 0}
+
+    def transform(self, documents, batch_size=1000):
+        """
+        generator that yields the documents in batches as sparse
+        csr matrices of shape (batch_size, n_features)
+        """
+        documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(documents, batch_size))
+            if len(batch) == 0:
+                break
+
+            indptr, indices, data = [0], [], []
+            for document in batch:
+                features = self.features(document)
+                keys = sorted(features)
+                indices.extend(keys)
+                data.extend(features[k] for k in keys)
+                indptr.append(len(indices))
+
+            yield sp.csr_matrix(
+                (
+                    np.array(data, dtype=np.float64),
+                    np.array(indices, dtype=np.int64),
+                    np.array(indptr, dtype=np.int64)
+                ),
+                shape=(len(batch), self.n_features)
+            )
+
+    def to_libsvm(self, documents, labels):
+        """
+        generator that yields a libsvm format line for each document
+        and its label (features are numbered starting from 1)
+        """
+        for document, label in zip(documents, labels):
+            features = self.features(document)
+            yield create_sparse_libsvmline(
+                int(label), {k + 1: v for k, v in features.items()}
+            )
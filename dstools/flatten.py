@@ -1,27 +1,224 @@
+import itertools
+import collections
+import concurrent.futures
+
+import numpy as np
+import ujson as json
+
+
+class KeyFilter:
+    """
+    compiled key filter for flatten_dict that holds the filter keys and
+    all their prefixes, so that subtrees which cannot contain any of the
+    filter keys are skipped; compile once and reuse across calls
+    """
+    def __init__(self, keys, seperator="."):
+        self.keys = frozenset(keys)
+        self.seperator = seperator
+
+        prefixes = set()
+        for key in self.keys:
+            parts = key.split(seperator)
+            for i in range(1, len(parts)):
+                prefixes.add(seperator.join(parts[:i]))
+        self.prefixes = frozenset(prefixes)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+
+def compile_key_filter(key_filter, seperator="."):
+    """
+    returns the compiled key filter of the given keys
+    """
+    if isinstance(key_filter, KeyFilter):
+        return key_filter
+
+    return KeyFilter(key_filter, seperator)
+
+
+def _iter_items(x):
+    """
+    returns an iterator over the (key, value) pairs of a dict or list
+    """
+    return iter(x.items()) if isinstance(x, dict) else enumerate(x)
+
+
+def _iter_leaves(y, key_filter, seperator):
+    """
+    generator yielding the (flattened key, value) pairs of the leaves of
+    the given dictionary in depth-first order, only descending into the
+    subtrees that can contain a key of the compiled key filter (if any)
+    """
+    if not isinstance(y, (dict, list)):
+        # --- value ---
+        if (key_filter is None) or ("" in key_filter):
+            yield "", y
+        return
+
+    if key_filter is not None:
+        keys, prefixes = key_filter.keys, key_filter.prefixes
+
+    # depth-first traversal with a stack of (key prefix, items iterator)
+    stack = [(None, _iter_items(y))]
+    while stack:
+        prefix, items = stack[-1]
+        for k, x in items:
+            key = str(k) if prefix is None else prefix + seperator + str(k)
+
+            if isinstance(x, (dict, list)):
+                # --- dict / list ---
+                if (key_filter is None) or (key in prefixes):
+                    # descend, unless no filter key is below
+                    stack.append((key, _iter_items(x)))
+                    break
+
+            elif (key_filter is None) or (key in keys):
+                # --- value ---
+                yield key, x
+
+        else:
+            # all items processed
+            stack.pop()
+
+
 def flatten_dict(y, key_filter=None, seperator="."):
     """
     flatten given dictionary, if filter is provided only given values are
-    returned
+    returned (the filter can be compiled before by compile_key_filter)
     """
-    res = {}
+    if key_filter is not None:
+        key_filter = compile_key_filter(key_filter, seperator)
 
-    def flatten(x, name="", seperator=""):
-        if isinstance(x, dict):
-            # --- dict ---
-            for k in x.keys():
-                flatten(x[k], "{}{}{}".format(name, k, seperator), seperator)
+    return dict(_iter_leaves(y, key_filter, seperator))
 
-        elif isinstance(x, list):
-            # --- list ---
-            for no, k in enumerate(x):
-                flatten(k, "{}{}{}".format(name, no, seperator), seperator)
 
-        else:
-            # --- value ---
-            key = name[:-1]
-            if (key_filter is None) or (key in key_filter):
-                res[key] = x
+def _flatten_into(columns, row, y, key_filter, seperator):
+    """
+    flatten the given record like flatten_dict, but append its values
+    directly to the (row numbers, values) of the given columns
+    """
+    for key, value in _iter_leaves(y, key_filter, seperator):
+        column = columns.get(key)
+        if column is None:
+            column = columns[key] = ([], [])
+        column[0].append(row)
+        column[1].append(value)
+
+
+def _flatten_chunk(records, key_filter, seperator):
+    """
+    flatten the given records (dicts or JSON strings) and return the
+    number of records and an ordered dictionary of key and
+    (row numbers, values) of the columns
+    """
+    columns = collections.OrderedDict()
+    for row, record in enumerate(records):
+        if isinstance(record, (str, bytes)):
+            record = json.loads(record)
+
+        _flatten_into(columns, row, record, key_filter, seperator)
+
+    return len(records), columns
+
+
+def _merge_chunk(columns, no_rows, result):
+    """
+    merge the columns of a flattened chunk into the given columns of
+    (list of row number arrays, values) and return the new number of rows
+    """
+    no_chunk_rows, chunk_columns = result
+    for key, (rows, values) in chunk_columns.items():
+        column = columns.get(key)
+        if column is None:
+            column = columns[key] = ([], [])
+        column[0].append(np.asarray(rows, dtype=np.int64) + no_rows)
+        column[1].extend(values)
+
+    return no_rows + no_chunk_rows
+
+
+def _to_array(no_rows, rows, values):
+    """
+    returns a numpy array of the given length with the values at the
+    given rows; missing values are NaN (numbers) or None (otherwise)
+    """
+    types = set(map(type, values))
+    is_full = len(rows) == no_rows
+
+    try:
+        if types == {int} and is_full:
+            return np.array(values, dtype=np.int64)
+        elif types == {bool} and is_full:
+            return np.array(values, dtype=bool)
+        elif types <= {int, float}:
+            arr = np.full(no_rows, np.nan)
+            arr[rows] = values
+            return arr
+
+    except OverflowError:
+        # integers not fitting into int64
+        pass
+
+    arr = np.full(no_rows, None, dtype=object)
+    arr[rows] = values
+
+    return arr
+
+
+def flatten_to_columns(
+    records, key_filter=None, seperator=".", as_frame=True,
+    no_processes=1, chunk_size=10000, max_pending=None
+):
+    """
+    flatten the given iterable of nested dicts or JSON lines (e.g. from
+    get_linewise) directly into columns; returns a pandas DataFrame or,
+    if as_frame is False, an ordered dictionary of key and numpy array
+    (missing values are NaN or None); if no_processes > 1, the records
+    are flattened in chunks of chunk_size on worker processes with at
+    most max_pending chunks (default: 2 * no_processes) in flight
+    """
+    if key_filter is not None:
+        key_filter = compile_key_filter(key_filter, seperator)
+
+    records = iter(records)
+    chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+
+    # key => (list of row number arrays, values) of the merged chunks
+    no_rows = 0
+    columns = collections.OrderedDict()
+
+    if no_processes > 1:
+        max_pending = max_pending or 2 * no_processes
+        with concurrent.futures.ProcessPoolExecutor(no_processes) as ex:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(
+                    ex.submit(_flatten_chunk, chunk, key_filter, seperator)
+                )
+                if len(pending) >= max_pending:
+                    no_rows = _merge_chunk(
+                        columns, no_rows, pending.popleft().result()
+                    )
+
+            while len(pending) > 0:
+                no_rows = _merge_chunk(
+                    columns, no_rows, pending.popleft().result()
+                )
+    else:
+        for chunk in chunks:
+            no_rows = _merge_chunk(
+                columns, no_rows, _flatten_chunk(chunk, key_filter, seperator)
+            )
+
+    arrays = collections.OrderedDict(
+        (key, _to_array(no_rows, np.concatenate(rows), values))
+        for key, (rows, values) in columns.items()
+    )
+
+    if not as_frame:
+        return arrays
 
-    flatten(y, seperator=".")
+    import pandas as pd
 
-    return res
+    return pd.DataFrame(arrays, index=pd.RangeIndex(no_rows))
@@ -1,4 +1,5 @@
 import re
+import itertools
 import collections
 import operator
 
@@ -36,6 +37,28 @@ def create_libsvmline(label, features, comment=None):
     return "%d %s\n" % (label, features_str)
 
 
+def create_sparse_libsvmline(label, features, comment=None):
+    """
+    creates a libsvm format line with provided label (integer),
+    the dictionary of (feature_no, value) pairs and an optional comment
+    """
+    assert(isinstance(label, int))
+
+    # prepare features dict as string (sorted by feature number)
+    features_str = " ".join(
+        "%d:%g" % (k, features[k])
+        for k in sorted(features)
+        if features[k] != 0
+    )
+
+    if comment is not None:
+        # return libsvm line with comment
+        return "%d %s # %s\n" % (label, features_str, comment)
+
+    # return libsvm line without comment
+    return "%d %s\n" % (label, features_str)
+
+
 def parse_libsvm_format(line):
     """
     parse a line from a libsvm format file and
@@ -108,6 +131,21 @@ def get_libsvm_pred(libsvmfile):
     return np.array(pred_labels, "i"), np.array(pred_scores, "f")
 
 
+def get_libsvm_pred_batches(libsvmfile, batch_size=2**16):
+    """
+    generator that returns the predicted labels and scores from the parsed
+    libsvm pred file in batches of given size
+    """
+    lines = get_linewise(libsvmfile, parse_libsvm_pred_format)
+    while True:
+        batch = list(itertools.islice(lines, batch_size))
+        if len(batch) == 0:
+            break
+
+        pred_labels, pred_scores = list(zip(*batch))
+        yield np.array(pred_labels, "i"), np.array(pred_scores, "f")
+
+
 def zip_features(features, feature_names):
     """
     simply zips the features obtained by parsing a libsvm file i.e.
@@ -1,23 +1,173 @@
 import string
+import itertools
+import functools
+import threading
+import collections
 import unicodedata
+import multiprocessing
 
-import nltk
-import inflect
-import bs4 as BeautifulSoup
+import ujson as json
 
+# nltk, inflect and bs4 as well as the inflection engine, the lemmatizer
+# and the stopwords are slow to load and thus only loaded on first use
 
-# inflection engine
-p = inflect.engine()
 
-# lemmatizer
-lemmatizer = nltk.WordNetLemmatizer()
+@functools.lru_cache(maxsize=None)
+def get_inflect_engine():
+    """
+    returns the inflection engine
+    """
+    import inflect
+
+    return inflect.engine()
+
+
+@functools.lru_cache(maxsize=None)
+def get_lemmatizer():
+    """
+    returns the WordNet lemmatizer
+    """
+    import nltk
+
+    return nltk.WordNetLemmatizer()
+
+
+def __getattr__(name):
+    # module attributes kept for backwards compatibility
+    if name == "p":
+        return get_inflect_engine()
+    elif name == "lemmatizer":
+        return get_lemmatizer()
+
+    raise AttributeError(
+        "module '{}' has no attribute '{}'".format(__name__, name)
+    )
+
+
+def _html_to_text(word):
+    """
+    returns the text of the given HTML
+    """
+    import bs4 as BeautifulSoup
+
+    return BeautifulSoup.BeautifulSoup(word, "html.parser").text
+
+
+# translation table to map punctuations to None
+punctuation_table = str.maketrans(dict.fromkeys(string.punctuation))
+
+
+class MemoCache:
+    """
+    thread-safe, bounded LRU cache of word results (e.g. stems and
+    lemmas) with hit/miss statistics that can be saved to disk and
+    loaded again to warm the cache at startup
+    """
+    def __init__(self, maxsize=2**17):
+        self._maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, func, *args):
+        """
+        returns the cached value of the key or computes it by
+        calling func with the given args
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+            except KeyError:
+                self.misses += 1
+
+        value = func(*args)
+        self._set(key, value)
+
+        return value
+
+    def _set(self, key, value):
+        """
+        set the value of the key, evicting the least recently used items
+        """
+        with self._lock:
+            self._data[key] = value
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        """
+        returns a dictionary with the cache statistics
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / float(total) if total > 0 else 0.0,
+                "size": len(self._data),
+                "maxsize": self._maxsize,
+            }
+
+    def clear(self):
+        """
+        clear the cache and its statistics
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def save(self, filename):
+        """
+        save the cached items as .json file
+        """
+        with self._lock:
+            items = [list(k) + [v] for k, v in self._data.items()]
+
+        with open(filename, "w") as f:
+            json.dump(items, f)
+
+    def load(self, filename):
+        """
+        load cached items from .json file
+        """
+        with open(filename, "r") as f:
+            for item in json.load(f):
+                self._set(tuple(item[:-1]), item[-1])
+
+    def __len__(self):
+        return len(self._data)
+
+
+# shared caches of stems (keyed by stemmer, word)
+# and lemmas (keyed by pos, word)
+stem_cache = MemoCache()
+lemma_cache = MemoCache()
+
+# stemmer instances per stemmer class
+_stemmers = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_stopwords(lang):
+    """
+    returns the stopwords of the given language from the nltk corpus
+    """
+    import nltk
+
+    return frozenset(nltk.corpus.stopwords.words(lang))
 
 
 def get_stopwords(lang="english", additional_stopwords=[]):
     """
     returns a set of unique stopwords
     """
-    stopwords = set(nltk.corpus.stopwords.words(lang))
+    stopwords = set(_load_stopwords(lang))
     if len(additional_stopwords) > 0:
         stopwords |= set(additional_stopwords)
 
@@ -58,9 +208,6 @@ def remove_punctuation(words):
     if isinstance(words, str):
         words = [words]
 
-    # translation table to map punctuations to None
-    punctuation_table = str.maketrans(dict.fromkeys(string.punctuation))
-
     return [
         word.translate(punctuation_table)
         for word in words
@@ -90,7 +237,7 @@ def remove_html(words):
         words = [words]
 
     return [
-        BeautifulSoup.BeautifulSoup(word, "html.parser").text
+        _html_to_text(word)
         for word in words
     ]
 
@@ -102,6 +249,7 @@ def replace_numbers(words):
     if isinstance(words, str):
         words = [words]
 
+    p = get_inflect_engine()
     return [
         p.number_to_words(word) if word.isdigit() else word
         for word in words
@@ -124,29 +272,52 @@ def remove_stopwords(words, stopwords):
     ]
 
 
-def stem(words, stemmer_class=nltk.PorterStemmer):
+def stem(words, stemmer_class=None, cache=stem_cache):
     """
-    stem the words
+    stem the words (memoized in the given cache, if not None);
+    uses nltk's PorterStemmer, if no stemmer_class is given
     """
     if isinstance(words, str):
         words = [words]
 
-    stemmer = stemmer_class()
+    if stemmer_class is None:
+        import nltk
+
+        stemmer_class = nltk.PorterStemmer
+
+    stemmer = _stemmers.get(stemmer_class)
+    if stemmer is None:
+        stemmer = _stemmers.setdefault(stemmer_class, stemmer_class())
+
+    if cache is None:
+        return [
+            stemmer.stem(word)
+            for word in words
+        ]
+
+    name = stemmer_class.__name__
     return [
-        stemmer.stem(word)
+        cache.get((name, word), stemmer.stem, word)
         for word in words
     ]
 
 
-def lemmatize(words, pos="v"):
+def lemmatize(words, pos="v", cache=lemma_cache):
     """
-    lemmatize the words
+    lemmatize the words (memoized in the given cache, if not None)
     """
     if isinstance(words, str):
         words = [words]
 
+    lemmatizer = get_lemmatizer()
+    if cache is None:
+        return [
+            lemmatizer.lemmatize(word, pos)
+            for word in words
+        ]
+
     return [
-        lemmatizer.lemmatize(word, pos)
+        cache.get((pos, word), lemmatizer.lemmatize, word, pos)
         for word in words
     ]
 
@@ -155,10 +326,11 @@ def normalize(
     words, do_strip=True, do_lowercase=True, do_remove_non_ascii=True,
     do_remove_punctuation=True, do_remove_html=True,
     do_replace_numbers=True, do_remove_stopwords=True,
-    stopwords=get_stopwords()
+    stopwords=None
 ):
     """
     normalize given words
+    (using the english stopwords, if no stopwords are given)
     """
     if do_remove_html:
         words = remove_html(words)
@@ -176,9 +348,307 @@ def normalize(
         words = replace_numbers(words)
 
     if do_remove_stopwords:
+        if stopwords is None:
+            stopwords = _load_stopwords("english")
         words = remove_stopwords(words, stopwords)
 
     if do_strip:
         words = strip(words)
 
     return words
+
+
+# ---------- vectorized functions for pandas series / numpy arrays -----------
+def _as_series(words):
+    """
+    returns the given words as pandas series of strings
+    """
+    import pandas as pd
+
+    if isinstance(words, pd.Series):
+        return words
+
+    return pd.Series(words, dtype=object)
+
+
+@functools.lru_cache(maxsize=2**16)
+def number_to_words(number):
+    """
+    returns the words of the given number (as string)
+    """
+    return get_inflect_engine().number_to_words(number)
+
+
+def strip_series(words):
+    """
+    strip words of a series and drop empty words
+    """
+    words = _as_series(words).str.strip()
+
+    return words[words != ""]
+
+
+def lowercase_series(words):
+    """
+    lowercase all words of a series
+    """
+    return _as_series(words).str.lower()
+
+
+def remove_punctuation_series(words):
+    """
+    remove the punctuation from words of a series
+    """
+    return _as_series(words).str.translate(punctuation_table)
+
+
+def remove_non_ascii_series(words):
+    """
+    remove all non ascii characters from words of a series
+    """
+    return _as_series(words).str.normalize("NFKD").str.encode(
+        "ascii", "ignore"
+    ).str.decode("utf-8", "ignore")
+
+
+def replace_numbers_series(words):
+    """
+    replace numbers to words in a series; each distinct number
+    is only converted once
+    """
+    words = _as_series(words)
+    is_number = words.str.isdigit().fillna(False).astype(bool)
+    if not is_number.any():
+        return words
+
+    numbers = words[is_number]
+    mapping = {
+        number: number_to_words(number)
+        for number in numbers.unique()
+    }
+
+    return words.mask(is_number, numbers.map(mapping))
+
+
+def remove_stopwords_series(words, stopwords):
+    """
+    removes all stop words from a series
+    """
+    assert(len(stopwords) > 0)
+
+    words = _as_series(words)
+
+    return words[~words.isin(stopwords)]
+
+
+class Normalizer:
+    """
+    compiled normalization pipeline equivalent to normalize() with the
+    given do_* flags, but processing each word in a single pass and
+    memoizing the results per word in a bounded LRU cache
+    """
+    def __init__(
+        self, do_strip=True, do_lowercase=True, do_remove_non_ascii=True,
+        do_remove_punctuation=True, do_remove_html=True,
+        do_replace_numbers=True, do_remove_stopwords=True,
+        stopwords=None, cache_size=2**16
+    ):
+        if do_remove_stopwords and (stopwords is None):
+            stopwords = _load_stopwords("english")
+
+        # compile the steps of the pipeline in the order of normalize()
+        steps = []
+        if do_remove_html:
+            steps.append(_html_to_text)
+        if do_remove_non_ascii:
+            steps.append(
+                lambda word: unicodedata.normalize("NFKD", word).encode(
+                    "ascii", "ignore"
+                ).decode("utf-8", "ignore")
+            )
+        if do_lowercase:
+            steps.append(str.lower)
+        if do_remove_punctuation:
+            steps.append(lambda word: word.translate(punctuation_table))
+        if do_replace_numbers:
+            p = get_inflect_engine()
+            steps.append(
+                lambda word: p.number_to_words(word) if word.isdigit()
+                else word
+            )
+
+        self._steps = steps
+        self._stopwords = stopwords if do_remove_stopwords else None
+        self._do_strip = do_strip
+        self._normalize_word = functools.lru_cache(maxsize=cache_size)(
+            self._normalize_word_uncached
+        )
+
+    def _normalize_word_uncached(self, word):
+        """
+        returns the normalized word or None, if the word is removed
+        """
+        for step in self._steps:
+            word = step(word)
+
+        if (self._stopwords is not None) and (word in self._stopwords):
+            return None
+
+        if self._do_strip:
+            word = word.strip()
+            if word == "":
+                return None
+
+        return word
+
+    def __call__(self, words):
+        """
+        normalize given words
+        """
+        if isinstance(words, str):
+            words = [words]
+
+        normalize_word = self._normalize_word
+        return [
+            word
+            for word in map(normalize_word, words)
+            if word is not None
+        ]
+
+    def normalize_documents(self, documents, batch_size=1024):
+        """
+        generator that normalizes the given documents (i.e. lists of
+        words) in batches; each distinct word of a batch is only
+        looked up once
+        """
+        documents = iter(documents)
+        while True:
+            batch = [
+                [doc] if isinstance(doc, str) else doc
+                for doc in itertools.islice(documents, batch_size)
+            ]
+            if len(batch) == 0:
+                break
+
+            # normalize the distinct words of the batch
+            normalized = {
+                word: self._normalize_word(word)
+                for word in set(itertools.chain.from_iterable(batch))
+            }
+
+            for doc in batch:
+                yield [
+                    normalized[word]
+                    for word in doc
+                    if normalized[word] is not None
+                ]
+
+    def cache_info(self):
+        """
+        returns the hits, misses, maxsize and currsize of the cache
+        """
+        return self._normalize_word.cache_info()
+
+    def cache_clear(self):
+        """
+        clear the cache of normalized words
+        """
+        self._normalize_word.cache_clear()
+
+
+# per process state of the corpus normalization workers
+_corpus_worker = {}
+
+
+def _create_corpus_state(normalize_kwargs, stemmer_class, lemmatize_pos):
+    """
+    returns the state of the normalizer, stemmer and lemmatizer
+    used to normalize the chunks of a corpus
+    """
+    if lemmatize_pos is not None:
+        # load WordNet before the first chunk arrives
+        get_lemmatizer().lemmatize("", lemmatize_pos)
+
+    return {
+        "normalizer": Normalizer(**normalize_kwargs),
+        "stemmer_class": stemmer_class,
+        "lemmatize_pos": lemmatize_pos,
+    }
+
+
+def _init_corpus_worker(normalize_kwargs, stemmer_class, lemmatize_pos):
+    """
+    initialize the normalizer, stemmer and lemmatizer once per process
+    """
+    _corpus_worker.update(
+        _create_corpus_state(normalize_kwargs, stemmer_class, lemmatize_pos)
+    )
+
+
+def _normalize_corpus_chunk(documents, state=None):
+    """
+    normalize, stem and lemmatize the given chunk of documents with the
+    given state (default: the state of the worker process)
+    """
+    state = _corpus_worker if state is None else state
+    normalizer = state["normalizer"]
+    stemmer_class = state["stemmer_class"]
+    pos = state["lemmatize_pos"]
+
+    res = []
+    for words in normalizer.normalize_documents(documents):
+        if stemmer_class is not None:
+            words = stem(words, stemmer_class)
+        if pos is not None:
+            words = lemmatize(words, pos)
+        res.append(words)
+
+    return res
+
+
+def normalize_corpus(
+    documents, no_processes=None, chunk_size=1000, stemmer_class=None,
+    lemmatize_pos=None, max_pending=None, **normalize_kwargs
+):
+    """
+    generator that normalizes the given iterable of documents (i.e. lists
+    of words) on a process pool in chunks and yields them in input order;
+    the documents are optionally stemmed by the stemmer_class and
+    lemmatized with the given POS; at most max_pending chunks (default:
+    twice the number of processes) are in flight to bound the memory
+    """
+    no_processes = no_processes or multiprocessing.cpu_count()
+    initargs = (normalize_kwargs, stemmer_class, lemmatize_pos)
+    documents = iter(documents)
+
+    def get_chunks():
+        while True:
+            chunk = list(itertools.islice(documents, chunk_size))
+            if len(chunk) == 0:
+                return
+            yield chunk
+
+    if no_processes == 1:
+        # process in the current process with a state of its own
+        state = _create_corpus_state(*initargs)
+        for chunk in get_chunks():
+            for words in _normalize_corpus_chunk(chunk, state):
+                yield words
+        return
+
+    max_pending = max_pending or 2 * no_processes
+    with multiprocessing.Pool(
+        no_processes, _init_corpus_worker, initargs
+    ) as pool:
+        pending = collections.deque()
+        for chunk in get_chunks():
+            pending.append(
+                pool.apply_async(_normalize_corpus_chunk, (chunk, ))
+            )
+            if len(pending) >= max_pending:
+                for words in pending.popleft().get():
+                    yield words
+
+        while len(pending) > 0:
+            for words in pending.popleft().get():
+                yield words
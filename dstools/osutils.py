@@ -8,6 +8,11 @@ import collections
 import bz2
 import shutil
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 
 # ----------- path ----------
 def get_path_or_create(path):
@@ -168,6 +173,11 @@ def open_read(filename):
     elif ext == ".bz2":
         # open as bz2
         return bz2.BZ2File(filename, "rb")
+    elif (ext == ".zst") and (zstandard is not None):
+        # open as zstd (reading all concatenated frames)
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(filename, "rb"), read_across_frames=True
+        )
     else:
         # open as normal text file
         if (sys.version_info > (3, 0)):
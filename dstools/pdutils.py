@@ -3,20 +3,37 @@ import pandas as pd
 
 def split_col(df, col_name, delimiter=","):
     """
-    splits the given column of a dataframe by the given delimiter
-    and creates for each entry from the split a separate row
+    splits the given column (or list of columns) of a dataframe by the
+    given delimiter and creates for each entry from the split a separate
+    row; multiple columns are split in parallel i.e. their entries must
+    have the same number of items; the given dataframe is not modified
     """
-    # split column and stack it
-    items = df[col_name].str.split(pat=delimiter).apply(
-        pd.Series, "columns"
-    ).stack()
+    if isinstance(col_name, list) or (
+        isinstance(col_name, tuple) and (col_name not in df.columns)
+    ):
+        col_names = list(col_name)
+    else:
+        # any other label (e.g. a str or an int) names a single column
+        col_names = [col_name]
 
-    # drop index and rename series to column name
-    items.index = items.index.droplevel(-1)
-    items.name = col_name
+    # split columns and move them to the end
+    splits = {
+        name: df[name].str.split(pat=delimiter)
+        for name in col_names
+    }
+    df = df.drop(columns=col_names)
+    for name in col_names:
+        df[name] = splits[name]
 
-    # remove old column and join split new column
-    del df[col_name]
-    df = df.join(pd.DataFrame(items))
+    # create a row per split entry
+    return df.explode(col_names if len(col_names) > 1 else col_names[0])
 
-    return df
+
+def split_col_chunks(chunks, col_name, delimiter=","):
+    """
+    generator that splits the given column (or list of columns) of each
+    dataframe of the given chunks (e.g. obtained by read_csv with
+    chunksize) to process dataframes not fitting into memory
+    """
+    for df in chunks:
+        yield split_col(df, col_name, delimiter)
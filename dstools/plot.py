@@ -1,7 +1,9 @@
 import os
 import logging
+import concurrent.futures
 
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 
 # disable extensive matplotlib logging
@@ -15,11 +17,16 @@ class FigureContext:
     """
     context manager that abstracts the creation of the figure
     and storing the final result in a file
+
+    if use_pyplot is False, the figure is created with the object-oriented
+    Agg API without touching pyplot's global state; a given figure is
+    cleared and reused instead of creating a new one
     """
     def __init__(
         self, targetdir, filename="out", title=None,
         xlabel="x", ylabel="y", rotate_xticks=True,
-        figsize=(15, 10), dpi=300, tight_layout=True, ext="pdf"
+        figsize=(15, 10), dpi=300, tight_layout=True, ext="pdf",
+        use_pyplot=True, figure=None, bbox_inches="tight"
     ):
         self._targetdir = targetdir
         self._filename = filename
@@ -31,28 +38,96 @@ class FigureContext:
         self._rotate_xticks = rotate_xticks
         self._tight_layout = tight_layout
         self._ext = ext
+        self._use_pyplot = use_pyplot and (figure is None)
+        self._figure = figure
+        self._bbox_inches = bbox_inches
+
+    @property
+    def output_filename(self):
+        return os.path.join(
+            self._targetdir, "{}.{}".format(self._filename, self._ext)
+        )
+
+    @property
+    def figure(self):
+        return self._figure
 
     def __enter__(self):
-        fig, ax = plt.subplots(figsize=self._figsize)
+        if self._use_pyplot:
+            import matplotlib.pyplot as plt
+
+            self._figure, ax = plt.subplots(figsize=self._figsize)
+
+        else:
+            if self._figure is None:
+                self._figure = Figure(figsize=self._figsize)
+            else:
+                # reuse given figure
+                self._figure.clear()
+                self._figure.set_size_inches(self._figsize)
 
-        plt.xlabel(self._xlabel)
-        plt.ylabel(self._ylabel)
+            if not isinstance(self._figure.canvas, FigureCanvasAgg):
+                FigureCanvasAgg(self._figure)
+            ax = self._figure.add_subplot()
+
+        ax.set_xlabel(self._xlabel)
+        ax.set_ylabel(self._ylabel)
 
         if self._title:
-            plt.title(self._title)
+            ax.set_title(self._title)
 
         if self._rotate_xticks is True:
-            plt.xticks(rotation=90)
+            ax.tick_params(axis="x", labelrotation=90)
 
         return ax
 
     def __exit__(self, exc_type, exc_value, exc_tb):
         if self._tight_layout is True:
-            plt.tight_layout()
+            self._figure.tight_layout()
 
-        output_filename = os.path.join(
-            self._targetdir, "{}.{}".format(self._filename, self._ext)
-        )
+        output_filename = self.output_filename
         log.debug("writing graph to '{}'...".format(output_filename))
-        plt.savefig(output_filename, bbox_inches="tight", dpi=self._dpi)
-        plt.close()
+        self._figure.savefig(
+            output_filename, bbox_inches=self._bbox_inches, dpi=self._dpi
+        )
+
+        if self._use_pyplot:
+            import matplotlib.pyplot as plt
+
+            plt.close(self._figure)
+
+
+# figure reused by the renders of each worker process
+_worker_figure = None
+
+
+def _render_figure(render_func, args, context_kwargs):
+    """
+    render one figure on the reused figure of the current process
+    """
+    global _worker_figure
+    if _worker_figure is None:
+        _worker_figure = Figure()
+
+    context = FigureContext(
+        use_pyplot=False, figure=_worker_figure, **context_kwargs
+    )
+    with context as ax:
+        render_func(ax, *args)
+
+    return context.output_filename
+
+
+def render_figures(jobs, no_processes=None):
+    """
+    render the figures of the given (render_func, args, context_kwargs)
+    jobs in parallel on no_processes worker processes without pyplot,
+    where render_func(ax, *args) draws on the axes of a FigureContext
+    created with context_kwargs; returns the output filenames
+    """
+    jobs = list(jobs)
+    if no_processes == 1:
+        return [_render_figure(*job) for job in jobs]
+
+    with concurrent.futures.ProcessPoolExecutor(no_processes) as ex:
+        return list(ex.map(_render_figure, *zip(*jobs)))
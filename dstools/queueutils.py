@@ -1,19 +1,77 @@
+import time
+import bisect
+import collections
+import asyncio
+import logging
 import threading
-from queue import Queue
+import multiprocessing
+from queue import Queue, Empty, Full
+
+
+# logger
+log = logging.getLogger(__name__)
+
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0
+)
 
 
 class ThreadedWorkerQueue:
     """
     queue that can be processed by multiple worker threads,
     calling the process_func on each item
+
+    if maxsize is set, put() blocks when the queue is full; if batch_size
+    is set, process_func is called with a list of up to batch_size items
+    (and must return a list of results); if collect_results is set, the
+    return values can be obtained by get_result() (in order of put(), if
+    ordered is set); failing items are logged and the last max_errors
+    (None: all) of them are kept in errors
+
+    if max_threads is set, an autoscaler adds worker threads (up to
+    max_threads), when the estimated waiting time of the queued items
+    exceeds max_wait seconds, and removes idle ones (down to min_threads)
+    every autoscale_interval seconds
     """
-    def __init__(self, process_func, no_threads=2, auto_start_workers=True):
-        self._q = Queue()
+    def __init__(
+        self, process_func, no_threads=2, auto_start_workers=True,
+        maxsize=0, batch_size=None, collect_results=False, ordered=False,
+        min_threads=1, max_threads=None, max_wait=1.0,
+        autoscale_interval=1.0, max_errors=1000
+    ):
+        self._q = Queue(maxsize)
         self._process_func = process_func
         self._no_threads = no_threads
         self._threads = []
         self._is_worker_running = False
         self._lock = threading.RLock()
+        self._batch_size = batch_size
+        self._collect_results = collect_results
+        self._ordered = ordered
+        self._results = Queue()
+        self._pending_results = {}
+        self._next_seq = 0
+        self._next_result_seq = 0
+        self._errors = collections.deque(maxlen=max_errors)
+
+        # metrics
+        self._workers = 0
+        self._busy_workers = 0
+        self._processed = 0
+        self._failed = 0
+        self._latency_sum = 0.0
+        self._latency_ema = None
+        self._latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._start_time = None
+
+        # autoscaler
+        self._min_threads = min_threads
+        self._max_threads = max_threads
+        self._max_wait = max_wait
+        self._autoscale_interval = autoscale_interval
+        self._autoscaler = None
+        self._stop_autoscaler = threading.Event()
 
         if auto_start_workers is True:
             # automatically start the workers
@@ -29,56 +87,555 @@ class ThreadedWorkerQueue:
         """
         start all worker threads
         """
-        if self.is_worker_running is True:
-            # already running => do nothing
-            return
-
         with self._lock:
+            if self.is_worker_running() is True:
+                # already running => do nothing
+                return
+
+            self._threads = []
             for _ in range(self._no_threads):
-                # start a new thread in daemon mode
-                self._threads.append(
-                    threading.Thread(target=self._worker_process)
-                )
-                self._threads[-1].daemon = True
-                self._threads[-1].start()
+                self._add_worker()
 
+            self._start_time = time.monotonic()
             self._is_worker_running = True
 
+            if self._max_threads is not None:
+                # start the autoscaler in daemon mode
+                self._stop_autoscaler.clear()
+                self._autoscaler = threading.Thread(target=self._autoscale)
+                self._autoscaler.daemon = True
+                self._autoscaler.start()
+
     def stop_workers(self):
         """
         stop all worker threads
         """
-        if self.is_worker_running is False:
-            return
+        with self._lock:
+            if self.is_worker_running() is False:
+                return
+
+            self._is_worker_running = False
+            autoscaler, self._autoscaler = self._autoscaler, None
+            self._stop_autoscaler.set()
+
+        # join without holding the lock, which the autoscaler and the
+        # workers need to finish
+        if autoscaler is not None:
+            autoscaler.join()
+
+        with self._lock:
+            threads, self._threads = self._threads, []
+            workers, self._workers = self._workers, 0
 
-        for _ in range(self._no_threads):
+        for _ in range(workers):
             self._q.put(None)
-        for t in self._threads:
+        for t in threads:
             t.join()
-        self._is_worker_running = False
+
+    def _add_worker(self):
+        """
+        start a new worker thread in daemon mode
+        """
+        with self._lock:
+            self._workers += 1
+            self._threads.append(
+                threading.Thread(target=self._worker_process)
+            )
+            self._threads[-1].daemon = True
+            self._threads[-1].start()
+
+    def _autoscale(self):
+        """
+        called by the autoscaler thread to adjust the number of workers
+        to the estimated waiting time of the queued items
+        """
+        while not self._stop_autoscaler.wait(self._autoscale_interval):
+            with self._lock:
+                depth = self._q.qsize()
+                latency = self._latency_ema or 0.0
+                wait = depth * latency / max(self._workers, 1)
+
+                if (wait > self._max_wait) and (
+                    self._workers < self._max_threads
+                ):
+                    log.debug("adding worker thread (wait {:.3f}s)".format(
+                        wait
+                    ))
+                    self._add_worker()
+
+                elif (
+                    (depth == 0) and
+                    (self._busy_workers < self._workers) and
+                    (self._workers > self._min_threads)
+                ):
+                    try:
+                        # never block while holding the lock
+                        self._q.put_nowait(None)
+
+                    except Full:
+                        pass
+
+                    else:
+                        log.debug("removing idle worker thread")
+                        self._workers -= 1
+
+                # forget stopped threads
+                self._threads = [t for t in self._threads if t.is_alive()]
 
     def _worker_process(self):
         """
         called by each worker thread to process the item
         """
         while True:
-            item = self._q.get()
-            if item is None:
+            entries = self._get_entries()
+            stop = entries[-1] is None
+            if stop:
+                entries.pop()
+
+            if len(entries) > 0:
+                with self._lock:
+                    self._busy_workers += 1
+
+                start = time.perf_counter()
+                failed = self._process_entries(entries)
+                self._update_metrics(
+                    len(entries), failed, time.perf_counter() - start
+                )
+
+            for _ in range(len(entries) + stop):
+                self._q.task_done()
+
+            if stop:
                 break
-            self._process_func(item)
-            self._q.task_done()
+
+    def _update_metrics(self, no_items, failed, duration):
+        """
+        update the metrics after processing the given number of items
+        """
+        latency = duration / no_items
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, latency)
+
+        with self._lock:
+            self._busy_workers -= 1
+            self._processed += no_items
+            if failed:
+                self._failed += no_items
+            self._latency_sum += duration
+            self._latency_histogram[bucket] += no_items
+            self._latency_ema = (
+                latency if self._latency_ema is None
+                else 0.9 * self._latency_ema + 0.1 * latency
+            )
+
+    @property
+    def metrics(self):
+        """
+        returns a dictionary of the current metrics
+        """
+        with self._lock:
+            elapsed = (
+                time.monotonic() - self._start_time
+                if self._start_time is not None else 0.0
+            )
+            return {
+                "queue_depth": self._q.qsize(),
+                "processed": self._processed,
+                "failed": self._failed,
+                "workers": self._workers,
+                "busy_workers": self._busy_workers,
+                "idle_workers": self._workers - self._busy_workers,
+                "throughput": (
+                    self._processed / elapsed if elapsed > 0 else 0.0
+                ),
+                "mean_latency": (
+                    self._latency_sum / self._processed
+                    if self._processed > 0 else 0.0
+                ),
+                "latency_histogram": collections.OrderedDict(
+                    zip(LATENCY_BUCKETS + (float("inf"), ),
+                        self._latency_histogram)
+                ),
+            }
+
+    def _get_entries(self):
+        """
+        returns the next (sequence number, item) entries from the queue,
+        i.e. up to batch_size entries in batch mode; a trailing None
+        signals that the worker has to stop
+        """
+        entries = [self._q.get()]
+        if self._batch_size is not None:
+            while (entries[-1] is not None) and (
+                len(entries) < self._batch_size
+            ):
+                try:
+                    entries.append(self._q.get_nowait())
+
+                except Empty:
+                    break
+
+        return entries
+
+    def _process_entries(self, entries):
+        """
+        call the process_func on the items of the entries and
+        collect the results and errors; returns True, if failed
+        """
+        try:
+            if self._batch_size is None:
+                results = [self._process_func(entries[0][1])]
+            else:
+                results = self._process_func([item for _, item in entries])
+                if self._collect_results and (
+                    (results is None) or (len(results) != len(entries))
+                ):
+                    raise ValueError(
+                        "process_func returned {} results for {} items".format(
+                            "no" if results is None else len(results),
+                            len(entries)
+                        )
+                    )
+
+        except Exception as e:
+            log.exception("processing of items failed")
+            with self._lock:
+                self._errors.extend((item, e) for _, item in entries)
+            results = None
+            failed = True
+
+        else:
+            failed = False
+
+        if self._collect_results:
+            self._add_results(entries, results)
+
+        return failed
+
+    def _add_results(self, entries, results):
+        """
+        add results to the results queue (in order of the sequence
+        numbers, if ordered); failed entries have no results
+        """
+        if not self._ordered:
+            if results is not None:
+                for result in results:
+                    self._results.put(result)
+            return
+
+        with self._lock:
+            for no, (seq, _) in enumerate(entries):
+                self._pending_results[seq] = (
+                    (results[no], ) if results is not None else ()
+                )
+
+            # release all consecutive results
+            while self._next_result_seq in self._pending_results:
+                for result in self._pending_results.pop(
+                    self._next_result_seq
+                ):
+                    self._results.put(result)
+                self._next_result_seq += 1
+
+    def put(self, item, block=True, timeout=None):
+        """
+        puts an item into the queue
+        (blocks, if the queue is full and block is set)
+        """
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+
+        try:
+            self._q.put((seq, item), block, timeout)
+
+        except Full:
+            if self._collect_results:
+                # the item has no result, do not stall the ordered results
+                self._add_results([(seq, item)], None)
+            raise
+
+    def get_result(self, block=True, timeout=None):
+        """
+        returns the next result of the process_func
+        (raises queue.Empty, if no result available)
+        """
+        return self._results.get(block, timeout)
+
+    def results(self):
+        """
+        yields all currently available results
+        """
+        while True:
+            try:
+                yield self._results.get_nowait()
+
+            except Empty:
+                return
+
+    @property
+    def errors(self):
+        """
+        returns a list of (item, exception) tuples of failed items
+        """
+        with self._lock:
+            return list(self._errors)
+
+    def join(self, auto_stop_workers=True):
+        """
+        blocks until all items in the queue have been gotten and processed
+        """
+        self._q.join()
+
+        if auto_stop_workers is True:
+            self.stop_workers()
+
+
+def _process_worker(q, process_func, initializer, initargs):
+    """
+    called by each worker process to process the batches of items
+    """
+    if initializer is not None:
+        # initialize the worker process once e.g. to load heavy state
+        initializer(*initargs)
+
+    while True:
+        batch = q.get()
+        if batch is None:
+            q.task_done()
+            break
+
+        for item in batch:
+            try:
+                process_func(item)
+
+            except Exception:
+                # keep the worker alive
+                log.exception("processing of item failed")
+        q.task_done()
+
+
+class ProcessWorkerQueue:
+    """
+    queue that can be processed by multiple worker processes,
+    calling the process_func on each item; the items are sent in
+    batches of batch_size to the workers to amortize the pickling
+    and the initializer is called once in each worker process
+    """
+    def __init__(
+        self, process_func, no_processes=None, auto_start_workers=True,
+        batch_size=64, initializer=None, initargs=(), mp_context=None
+    ):
+        self._ctx = multiprocessing.get_context(mp_context)
+        self._q = self._ctx.JoinableQueue()
+        self._process_func = process_func
+        self._no_processes = no_processes or multiprocessing.cpu_count()
+        self._batch_size = batch_size
+        self._batch = []
+        self._initializer = initializer
+        self._initargs = initargs
+        self._processes = []
+        self._is_worker_running = False
+        self._lock = threading.RLock()
+
+        if auto_start_workers is True:
+            # automatically start the workers
+            self.start_workers()
+
+    def is_worker_running(self):
+        """
+        returns True, if worker processes are running
+        """
+        return self._is_worker_running
+
+    def start_workers(self):
+        """
+        start all worker processes
+        """
+        with self._lock:
+            if self.is_worker_running() is True:
+                # already running => do nothing
+                return
+
+            self._processes = []
+            for _ in range(self._no_processes):
+                # start a new process in daemon mode
+                self._processes.append(
+                    self._ctx.Process(
+                        target=_process_worker,
+                        args=(
+                            self._q, self._process_func,
+                            self._initializer, self._initargs
+                        )
+                    )
+                )
+                self._processes[-1].daemon = True
+                self._processes[-1].start()
+
+            self._is_worker_running = True
+
+    def stop_workers(self):
+        """
+        stop all worker processes (pending items are processed before)
+        """
+        with self._lock:
+            if self.is_worker_running() is False:
+                return
+
+            self._put_batch()
+            for _ in range(self._no_processes):
+                self._q.put(None)
+            for p in self._processes:
+                p.join()
+            self._is_worker_running = False
+
+    def _put_batch(self):
+        """
+        send the current batch of items to the workers
+        """
+        with self._lock:
+            if len(self._batch) > 0:
+                self._q.put(self._batch)
+                self._batch = []
 
     def put(self, item):
         """
         puts an item into the queue
         """
-        self._q.put(item)
+        with self._lock:
+            self._batch.append(item)
+            if len(self._batch) >= self._batch_size:
+                self._put_batch()
 
     def join(self, auto_stop_workers=True):
         """
         blocks until all items in the queue have been gotten and processed
         """
+        self._put_batch()
         self._q.join()
 
         if auto_stop_workers is True:
             self.stop_workers()
+
+
+class AsyncWorkerQueue:
+    """
+    asyncio counterpart of the ThreadedWorkerQueue i.e. a queue that is
+    processed by multiple worker tasks within one thread, awaiting the
+    coroutine process_func on each item; must be used within a running
+    event loop; if maxsize is set, put() waits when the queue is full;
+    the last max_errors (None: all) failing items are kept in errors
+    """
+    def __init__(
+        self, process_func, no_workers=100, auto_start_workers=True,
+        maxsize=0, max_errors=1000
+    ):
+        self._q = asyncio.Queue(maxsize)
+        self._process_func = process_func
+        self._no_workers = no_workers
+        self._tasks = []
+        self._is_worker_running = False
+        self._errors = collections.deque(maxlen=max_errors)
+
+        if auto_start_workers is True:
+            # automatically start the workers
+            self.start_workers()
+
+    def is_worker_running(self):
+        """
+        returns True, if worker tasks are running
+        """
+        return self._is_worker_running
+
+    def start_workers(self):
+        """
+        start all worker tasks
+        """
+        if self.is_worker_running() is True:
+            # already running => do nothing
+            return
+
+        self._tasks = [
+            asyncio.ensure_future(self._worker_process())
+            for _ in range(self._no_workers)
+        ]
+        self._is_worker_running = True
+
+    async def stop_workers(self):
+        """
+        stop all worker tasks gracefully
+        (i.e. after the pending items have been processed)
+        """
+        if self.is_worker_running() is False:
+            return
+
+        for _ in range(self._no_workers):
+            await self._q.put(None)
+        await asyncio.gather(*self._tasks)
+        self._is_worker_running = False
+
+    async def cancel(self):
+        """
+        cancel all worker tasks immediately (pending items are dropped)
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._is_worker_running = False
+
+    async def _worker_process(self):
+        """
+        called by each worker task to process the item
+        """
+        while True:
+            item = await self._q.get()
+            if item is None:
+                self._q.task_done()
+                break
+
+            try:
+                await self._process_func(item)
+
+            except Exception as e:
+                # keep the worker alive
+                log.exception("processing of item failed")
+                self._errors.append((item, e))
+
+            self._q.task_done()
+
+    async def put(self, item):
+        """
+        puts an item into the queue (waits, if the queue is full)
+        """
+        await self._q.put(item)
+
+    async def join(self, auto_stop_workers=True):
+        """
+        waits until all items in the queue have been gotten and processed
+        """
+        await self._q.join()
+
+        if auto_stop_workers is True:
+            await self.stop_workers()
+
+    @property
+    def errors(self):
+        """
+        returns a list of (item, exception) tuples of failed items
+        """
+        return list(self._errors)
+
+    @property
+    def qsize(self):
+        """
+        returns the number of queued items
+        """
+        return self._q.qsize()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):
+        if exc_type is None:
+            await self.join()
+        else:
+            await self.cancel()
@@ -1,18 +1,212 @@
 from builtins import str
 
 import os
+import io
+import time
 import datetime
 import gzip
+import logging
+import threading
+import collections
+import concurrent.futures
+from queue import Queue, Full
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# logger
+log = logging.getLogger(__name__)
+
+# next free sequence number per (path, name, ext) of the latest start
+# timestamp; older start timestamps are dropped, since they cannot recur
+_sequence_numbers = {}
+_sequence_lock = threading.Lock()
+
+
+def _scan_sequence_numbers(path, name, ext, timestamp_format):
+    """
+    returns the next free sequence numbers per start timestamp
+    of the existing files in the given path
+    """
+    numbers = {}
+    if not os.path.isdir(path):
+        return numbers
+
+    # the filenames are <start>_<end>_<name>_<no>.<ext>, where start and
+    # end (or "now") may contain as many "_" as the timestamp format
+    no_parts = timestamp_format.count("_") + 1
+    suffix = ".{}".format(ext)
+    for filename in os.listdir(path):
+        if not filename.endswith(suffix):
+            continue
+
+        head, _, no = filename[:-len(suffix)].rpartition("_")
+        if (not no.isdigit()) or (not head.endswith("_" + name)):
+            continue
+
+        parts = head[:-len(name) - 1].split("_")
+        end = parts[no_parts:]
+        if (len(parts) <= no_parts) or (
+            (end != ["now"]) and (len(end) != no_parts)
+        ):
+            continue
+
+        start_dt = "_".join(parts[:no_parts])
+        numbers[start_dt] = max(numbers.get(start_dt, 0), int(no) + 1)
+
+    return numbers
+
+
+def _next_sequence_number(path, name, ext, start_dt, timestamp_format):
+    """
+    returns the next free sequence number for the given start timestamp;
+    the directory is only scanned once per (path, name, ext)
+    """
+    with _sequence_lock:
+        key = (path, name, ext)
+        if key not in _sequence_numbers:
+            _sequence_numbers[key] = _scan_sequence_numbers(
+                path, name, ext, timestamp_format
+            )
+
+        numbers = _sequence_numbers[key]
+        no = numbers.get(start_dt, 0)
+        _sequence_numbers[key] = {start_dt: no + 1}
+
+        return no
+
+
+class _CountingWriter(object):
+    """
+    file object wrapper that counts the bytes written to the wrapped file
+    """
+    def __init__(self, f, count=0):
+        self._f = f
+        self.count = count
+
+    def write(self, data):
+        self.count += len(data)
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class _BlockCompressWriter(io.BufferedIOBase):
+    """
+    file object that compresses independent blocks on a thread pool and
+    writes them in order to the wrapped file i.e. as concatenated gzip
+    members (or zstd frames) that can be read by standard tools
+    """
+    def __init__(self, f, compress_func, threads=2, block_size=1024**2):
+        self._f = f
+        self._compress_func = compress_func
+        self._block_size = block_size
+        self._max_pending = 2 * threads
+        self._buffer = bytearray()
+        self._pending = collections.deque()
+        self._executor = concurrent.futures.ThreadPoolExecutor(threads)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self._block_size:
+            self._submit()
+
+        self._write_compressed()
+
+        return len(data)
+
+    def _submit(self):
+        """
+        submit the buffered block for compression
+        """
+        if len(self._buffer) > 0:
+            self._pending.append(
+                self._executor.submit(self._compress_func, bytes(self._buffer))
+            )
+            self._buffer = bytearray()
+
+    def _write_compressed(self, wait=False):
+        """
+        write the compressed blocks in order; blocks until
+        the number of pending blocks is within limit (or all done,
+        if wait is set)
+        """
+        while (len(self._pending) > 0) and (
+            wait or self._pending[0].done() or
+            (len(self._pending) > self._max_pending)
+        ):
+            self._f.write(self._pending.popleft().result())
+
+    def flush(self):
+        if self.closed:
+            return
+
+        self._submit()
+        self._write_compressed(wait=True)
+        self._f.flush()
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            self.flush()
+
+        finally:
+            self._executor.shutdown()
+            io.BufferedIOBase.close(self)
+
+
+def _gzip_compressor(level):
+    """
+    returns a function that compresses a block as gzip member
+    """
+    def compress(data):
+        return gzip.compress(data, level)
+
+    return compress
+
+
+def _zstd_compressor(level):
+    """
+    returns a function that compresses a block as zstd frame
+    """
+    def compress(data):
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    return compress
 
 
 class RawFile(object):
     """
     class to handle raw files, including auto naming after timestamps
-    and splitting of files hitting the maximum MB size
+    and splitting of files hitting the maximum MB size, the maximum
+    number of records or the rotation interval (in seconds, aligned
+    to the clock if rotate_align is set)
+
+    the written bytes are accounted internally, so that no stat calls
+    are required to check the size; flushes can be batched by setting
+    flush_bytes and/or flush_interval (in seconds)
+
+    if compress_threads is set, blocks of compress_block_size bytes are
+    compressed in parallel and written as separate gzip members (or zstd
+    frames, if zstd is set); unless a flush policy is given, the file is
+    then flushed per block
     """
     def __init__(
         self, path, name, ext, prefix="", postfix="",
-        max_size_mb=64, mode="wb", gzip=True
+        max_size_mb=64, mode="wb", gzip=True,
+        flush_bytes=None, flush_interval=None,
+        max_records=None, rotate_interval=None, rotate_align=True,
+        timestamp_format="%Y%m%d%H%M", compress_threads=None,
+        compress_level=None, compress_block_size=1024**2, zstd=False
     ):
         self.path = path
         self.name = name
@@ -22,6 +216,26 @@ class RawFile(object):
         self.max_size_mb = max_size_mb
         self.gzip = gzip
         self.mode = mode
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_records = max_records
+        self.rotate_interval = rotate_interval
+        self.rotate_align = rotate_align
+        self.timestamp_format = timestamp_format
+        self.compress_threads = compress_threads
+        self.compress_level = compress_level
+        self.compress_block_size = compress_block_size
+        self.zstd = zstd
+
+        if zstd and (zstandard is None):
+            raise ImportError("zstd compression requires 'zstandard'")
+
+        if (
+            self._is_block_compressed() and
+            (flush_bytes is None) and (flush_interval is None)
+        ):
+            # flush per block to avoid tiny compressed blocks
+            self.flush_bytes = compress_block_size
 
         self.reset()
 
@@ -31,10 +245,15 @@ class RawFile(object):
         """
         # create new start date
         self._f = None
-        self.no = 0
+        self._raw = None
+        self._bytes_written = 0
+        self._unflushed_bytes = 0
+        self._last_flush = time.monotonic()
+        self._records = 0
         self.start_dt = datetime.datetime.now()
         self.end_dt = None
-        self._filename = self._generate_filename()
+        self._rotate_at = self._get_rotation_time()
+        self._reserve_filename()
 
         if auto_reopen:
             # reopen new file
@@ -59,16 +278,78 @@ class RawFile(object):
         # rename file
         os.rename(prev_filename, self._filename)
 
+    def _reserve_filename(self):
+        """
+        reserve the next sequence number of the start timestamp
+        and generate the filename
+        """
+        self.no = _next_sequence_number(
+            os.path.abspath(self.path), self._get_basename(), self.ext,
+            self.start_dt.strftime(self.timestamp_format),
+            self.timestamp_format
+        )
+        self._filename = self._generate_filename()
+
+    def _open_file(self, mode):
+        """
+        open the file in the given mode; new files are created exclusively
+        and, if another process has created the file already, the next
+        sequence number is used instead of truncating the file
+        """
+        if not mode.startswith("w"):
+            return open(self.filename, mode)
+
+        while True:
+            try:
+                return open(self.filename, "x" + mode[1:])
+
+            except FileExistsError:
+                log.debug("'{}' exists, trying next sequence number".format(
+                    self.filename
+                ))
+                self._reserve_filename()
+
     def open(self):
         """
         open internal file
         """
-        if not self.gzip:
+        # size of an existing file (when appending) is determined once
+        size = 0
+        if self.mode.startswith("a") and os.path.exists(self.filename):
+            size = os.path.getsize(self.filename)
+
+        if self._is_block_compressed():
+            # open block compressed file on top of the counting raw file
+            raw_mode = self.mode.replace("t", "").replace("b", "") + "b"
+            self._raw = _CountingWriter(self._open_file(raw_mode), size)
+            level = self.compress_level
+            if self.zstd:
+                compress_func = _zstd_compressor(3 if level is None else level)
+            else:
+                compress_func = _gzip_compressor(9 if level is None else level)
+
+            self._f = _BlockCompressWriter(
+                self._raw, compress_func, self.compress_threads or 1,
+                self.compress_block_size
+            )
+            if "t" in self.mode:
+                self._f = io.TextIOWrapper(self._f)
+
+        elif not self.gzip:
             # open normal file
-            self._f = open(self.filename, self.mode)
+            self._raw = _CountingWriter(self._open_file(self.mode), size)
+            self._f = self._raw
         else:
-            # open gzip file
-            self._f = gzip.open(self.filename, self.mode)
+            # open gzip file on top of the counting raw file
+            raw_mode = self.mode.replace("t", "").replace("b", "") + "b"
+            self._raw = _CountingWriter(self._open_file(raw_mode), size)
+            self._f = gzip.open(self._raw, self.mode)
+
+    def _is_block_compressed(self):
+        """
+        returns true, if blocks are compressed on a thread pool
+        """
+        return self.zstd or (self.gzip and bool(self.compress_threads))
 
     def close(self):
         """
@@ -77,12 +358,18 @@ class RawFile(object):
         if (self._f is not None) and (not self._f.closed):
             self._f.close()
 
-    def write(self, content, flush=True, auto_split=True):
+        if (self._raw is not None) and (not self._raw.closed):
+            # the gzip file does not close the underlying file
+            self._raw.close()
+
+    def write(self, content, flush=None, auto_split=True):
         """
-        write content to file
+        write content to file; if flush is None, the file is flushed
+        according to flush_bytes and flush_interval (or after each write,
+        if both are not set)
         """
         if auto_split:
-            if self.is_size_exceeded():
+            if self.is_rotation_due():
                 # finalize existing file
                 self.finalize()
 
@@ -90,17 +377,101 @@ class RawFile(object):
                 self.reset()
 
         self._f.write(content)
+        self._records += 1
+        self._bytes_written += len(content)
+        self._unflushed_bytes += len(content)
+
+        if flush is None:
+            flush = self._is_flush_due()
         if flush:
-            self._f.flush()
+            self.flush()
+
+    def flush(self):
+        """
+        flush internal file
+        """
+        self._f.flush()
+        self._unflushed_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def _is_flush_due(self):
+        """
+        returns true, if a flush is due according to the flush policy
+        """
+        if (self.flush_bytes is None) and (self.flush_interval is None):
+            # no batching => flush after each write
+            return True
+
+        return (
+            (
+                (self.flush_bytes is not None) and
+                (self._unflushed_bytes >= self.flush_bytes)
+            ) or (
+                (self.flush_interval is not None) and
+                (time.monotonic() - self._last_flush >= self.flush_interval)
+            )
+        )
+
+    @property
+    def bytes_written(self):
+        """
+        returns the number of (uncompressed) bytes written to the file
+        """
+        return self._bytes_written
+
+    @property
+    def file_size(self):
+        """
+        returns the number of bytes written to disk i.e. compressed
+        bytes, if gzip is used (lagging the compressor's buffer)
+        """
+        return self._raw.count if self._raw is not None else 0
+
+    @property
+    def records(self):
+        """
+        returns the number of records (i.e. writes) to the file
+        """
+        return self._records
+
+    def _get_rotation_time(self):
+        """
+        returns the unix time, when the file is due to rotate
+        (or None, if no rotation interval set)
+        """
+        if self.rotate_interval is None:
+            return None
+
+        now = time.time()
+        if self.rotate_align:
+            # next multiple of the interval on the clock
+            return (now // self.rotate_interval + 1) * self.rotate_interval
+
+        return now + self.rotate_interval
+
+    def is_rotation_due(self):
+        """
+        returns true, if the file size, the number of records or
+        the rotation interval exceeds its limit
+        """
+        return (
+            self.is_size_exceeded() or
+            (
+                (self.max_records is not None) and
+                (self._records >= self.max_records)
+            ) or (
+                (self._rotate_at is not None) and
+                (time.time() >= self._rotate_at)
+            )
+        )
 
     def is_size_exceeded(self):
         """
-        returns true, if the current filesize exceeds or no limit set
+        returns true, if the current filesize exceeds the limit
         """
-        current_size_mb = os.path.getsize(self.filename) / float(1024**2)
         return (
-            (self.max_size_mb is None) or
-            (current_size_mb > self.max_size_mb)
+            (self.max_size_mb is not None) and
+            (self.file_size > self.max_size_mb * 1024**2)
         )
 
     def _generate_filename(self):
@@ -111,14 +482,26 @@ class RawFile(object):
         """
 
         # start timestamp
-        start_dt = self.start_dt.strftime("%Y%m%d%H%M")
+        start_dt = self.start_dt.strftime(self.timestamp_format)
 
         # end timestamp
         end_dt = "now"
         if self.end_dt is not None:
-            end_dt = self.end_dt.strftime("%Y%m%d%H%M")
+            end_dt = self.end_dt.strftime(self.timestamp_format)
+
+        # the sequence number is reserved in memory on reset,
+        # so that the filename is free without probing the directory
+        return os.path.join(
+            os.path.abspath(self.path),
+            "%s_%s_%s_%03d.%s" % (
+                start_dt, end_dt, self._get_basename(), self.no, self.ext
+            )
+        )
 
-        # base name
+    def _get_basename(self):
+        """
+        returns the base name consisting of prefix, name and postfix
+        """
         name = ""
         if self.prefix != "":
             name += "%s_" % self.prefix
@@ -126,23 +509,148 @@ class RawFile(object):
         if self.postfix != "":
             name += "_%s" % self.postfix
 
-        # get non-existing filename
-        filename = None
+        return name
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def __str__(self):
+        return self.filename
+
+
+class AsyncRawFile(object):
+    """
+    raw file whose compression, I/O and rotation is done by a background
+    writer thread; write() only enqueues the content into a bounded queue
+    that blocks (or drops the write, if block is False) when full
+    """
+    def __init__(self, *args, queue_size=1024, block=True, **kwargs):
+        self._rawfile = RawFile(*args, **kwargs)
+        self._q = Queue(maxsize=queue_size)
+        self._block = block
+        self._dropped_writes = 0
+        self._error = None
+        self._lock = threading.RLock()
+
+        # start the writer thread in daemon mode
+        self._thread = threading.Thread(target=self._writer_process)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _writer_process(self):
+        """
+        called by the writer thread to process the queued operations
+        """
         while True:
-            filename = os.path.join(
-                os.path.abspath(self.path),
-                "%s_%s_%s_%03d.%s" % (
-                    start_dt, end_dt, name, self.no, self.ext
-                )
-            )
-            if not os.path.exists(filename):
-                return filename
+            item = self._q.get()
+            if item is None:
+                self._q.task_done()
+                break
+
+            func, args = item
+            try:
+                func(*args)
+
+            except Exception as e:
+                log.exception("writing to '{}' failed".format(self.filename))
+                self._error = e
+
+            self._q.task_done()
+
+    def _put(self, item, block=True, timeout=None):
+        """
+        put an item into the queue, returns False, if it was dropped
+        """
+        if not self._thread.is_alive():
+            raise ValueError("writer of '{}' is closed".format(self.filename))
+
+        try:
+            self._q.put(item, block, timeout)
+
+        except Full:
+            with self._lock:
+                self._dropped_writes += 1
+            return False
+
+        return True
+
+    def _raise_error(self):
+        """
+        re-raise the last error of the writer thread
+        """
+        if self._error is not None:
+            e, self._error = self._error, None
+            raise e
+
+    def write(self, content, flush=None, auto_split=True, block=None,
+              timeout=None):
+        """
+        enqueue content to be written to file, returns False,
+        if the write was dropped due to a full queue
+        """
+        return self._put(
+            (self._rawfile.write, (content, flush, auto_split)),
+            self._block if block is None else block, timeout
+        )
+
+    def flush(self):
+        """
+        block until all queued writes are done and flush the file
+        """
+        self._put((self._rawfile.flush, ()))
+        self._q.join()
+        self._raise_error()
+
+    def _stop(self):
+        """
+        drain the queue and stop the writer thread
+        """
+        if self._thread.is_alive():
+            self._q.put(None)
+            self._thread.join()
+
+    def close(self):
+        """
+        drain the queue, stop the writer thread and close the file
+        """
+        self._stop()
+        self._rawfile.close()
+        self._raise_error()
+
+    def finalize(self):
+        """
+        drain the queue, stop the writer thread and finalize the file
+        """
+        self._stop()
+        self._rawfile.finalize()
+        self._raise_error()
+
+    @property
+    def queue_depth(self):
+        """
+        returns the number of queued operations
+        """
+        return self._q.qsize()
 
-            self.no += 1
+    @property
+    def dropped_writes(self):
+        """
+        returns the number of writes dropped due to a full queue
+        """
+        return self._dropped_writes
+
+    @property
+    def bytes_written(self):
+        return self._rawfile.bytes_written
+
+    @property
+    def file_size(self):
+        return self._rawfile.file_size
 
     @property
     def filename(self):
-        return self._filename
+        return self._rawfile.filename
 
     def __str__(self):
         return self.filename
@@ -1,9 +1,11 @@
+import os
 import logging
+import collections
+import concurrent.futures
 
 import ujson as json
 import numpy as np
 from sklearn.metrics import roc_curve, auc
-import matplotlib.pyplot as plt
 from matplotlib import ticker
 
 from .plot import FigureContext
@@ -14,6 +16,73 @@ logging.getLogger("matplotlib").setLevel(logging.WARNING)
 # logger
 log = logging.getLogger(__name__)
 
+# AUC with its bootstrap confidence interval
+AucCI = collections.namedtuple("AucCI", "auc lower upper")
+
+
+def _bootstrap_aucs(is_pos, distinct_idx, max_fpr, n_bootstraps, seed):
+    """
+    returns the (bounded-)AUCs of n_bootstraps replicates, given the
+    positive flags of the samples sorted by descending score and the
+    indices of the last sample of each distinct score
+    """
+    rng = np.random.default_rng(seed)
+    n = len(is_pos)
+    aucs = np.empty(n_bootstraps)
+    for no in range(n_bootstraps):
+        # resampling with replacement as weights of the sorted samples
+        weights = np.bincount(rng.integers(0, n, n), minlength=n)
+        tps = np.cumsum(weights * is_pos)[distinct_idx]
+        fps = np.cumsum(weights * ~is_pos)[distinct_idx]
+        if (tps[-1] == 0) or (fps[-1] == 0):
+            # undefined, if only one class was drawn
+            aucs[no] = np.nan
+            continue
+
+        fpr = np.r_[0.0, fps / float(fps[-1])]
+        tpr = np.r_[0.0, tps / float(tps[-1])]
+        aucs[no] = RocCurve._bounded_auc(fpr, tpr, max_fpr)[2]
+
+    return aucs
+
+
+def _simplify_curve(x, y, max_points):
+    """
+    returns the sorted indices of at most max_points points of the curve
+    by removing the points whose removal changes the area under the curve
+    least (Visvalingam), i.e. the points spanning the smallest triangles
+    with their neighbours; each round removes up to a quarter of the
+    points at once, but never two neighbours; the end points are kept
+    """
+    idx = np.arange(len(x))
+    while len(idx) > max_points:
+        xs, ys = x[idx], y[idx]
+
+        # triangle areas with the neighbours i.e. the area change by removal
+        areas = np.r_[np.inf, 0.5 * np.abs(
+            (xs[1:-1] - xs[:-2]) * (ys[2:] - ys[:-2]) -
+            (xs[2:] - xs[:-2]) * (ys[1:-1] - ys[:-2])
+        ), np.inf]
+
+        # candidates are the smallest areas that are local minima,
+        # so that no two neighbouring points are removed together
+        k = min(len(idx) - max_points, max(1, len(idx) // 4))
+        threshold = np.partition(areas, k - 1)[k - 1]
+        is_min = np.r_[
+            False,
+            (areas[1:-1] < areas[:-2]) & (areas[1:-1] <= areas[2:]),
+            False
+        ]
+        candidates = np.flatnonzero(is_min & (areas <= threshold))
+        if len(candidates) > k:
+            candidates = candidates[
+                np.argpartition(areas[candidates], k - 1)[:k]
+            ]
+
+        idx = np.delete(idx, candidates)
+
+    return idx
+
 
 class RocCurve:
     """
@@ -40,6 +109,7 @@ class RocCurve:
             "name": self._name,
             "fpr": self._fpr,
             "tpr": self._tpr,
+            "thresholds": getattr(self, "_thresholds", None),
         }
 
     def set_name(self, name):
@@ -54,7 +124,57 @@ class RocCurve:
         """
         return self._bounded_auc(self._fpr, self._tpr, max_fpr)
 
-    def _bounded_auc(self, fpr, tpr, max_fpr=None):
+    def auc_ci(
+        self, labels, scores, max_fpr=1.0, n_bootstraps=1000, alpha=0.05,
+        no_processes=1, seed=None
+    ):
+        """
+        returns the (bounded-)AUC with its percentile bootstrap confidence
+        interval at the 1 - alpha level, given the labels and scores the
+        ROC curve was computed from (they are not kept by the curve); the
+        scores are sorted once and the replicates are spread over
+        no_processes worker processes
+        """
+        labels = np.asarray(labels)
+        scores = np.asarray(scores)
+        assert(len(labels) == len(scores))
+
+        # sort once by descending score (positive label is 1)
+        order = np.argsort(scores, kind="mergesort")[::-1]
+        is_pos = labels[order] == 1
+        sorted_scores = scores[order]
+        distinct_idx = np.r_[
+            np.where(np.diff(sorted_scores))[0], len(sorted_scores) - 1
+        ]
+
+        # split the replicates into chunks with independent seeds
+        no_chunks = max(1, no_processes)
+        sizes = [
+            len(chunk)
+            for chunk in np.array_split(np.arange(n_bootstraps), no_chunks)
+        ]
+        seeds = np.random.SeedSequence(seed).spawn(no_chunks)
+        args = [
+            (is_pos, distinct_idx, max_fpr, size, seed)
+            for size, seed in zip(sizes, seeds)
+        ]
+
+        if no_processes > 1:
+            with concurrent.futures.ProcessPoolExecutor(no_processes) as ex:
+                aucs = np.concatenate(
+                    list(ex.map(_bootstrap_aucs, *zip(*args)))
+                )
+        else:
+            aucs = np.concatenate([_bootstrap_aucs(*arg) for arg in args])
+
+        lower, upper = np.nanpercentile(
+            aucs, [100 * alpha / 2, 100 * (1 - alpha / 2)]
+        )
+
+        return AucCI(self.auc(max_fpr)[2], float(lower), float(upper))
+
+    @staticmethod
+    def _bounded_auc(fpr, tpr, max_fpr=None):
         """
         compute the bounded AUC of a ROC curve on given
         false positive rate and true positive rate
@@ -77,51 +197,289 @@ class RocCurve:
 
         return fpr, tpr, auc_
 
-    def plot(self, ax, max_fpr=1.0, title=None, random_line=True):
+    def plot(
+        self, ax, max_fpr=1.0, title=None, random_line=True, rasterized=None
+    ):
         # plot ROC curve
-        ax.plot(self._fpr, self._tpr, label=self._name)
+        ax.plot(self._fpr, self._tpr, label=self._name, rasterized=rasterized)
 
         # plot random predictions line
         if random_line is True:
-            plt.plot([0, 1], [0, 1], "k--")
+            ax.plot([0, 1], [0, 1], "k--")
 
         ax.xaxis.set_major_locator(ticker.MaxNLocator(prune='lower'))
-        plt.xlim([0.0, max_fpr or 1.0])
-        plt.ylim([0.0, 1.0])
+        ax.set_xlim([0.0, max_fpr or 1.0])
+        ax.set_ylim([0.0, 1.0])
 
         if title is not None:
-            plt.title(title)
+            ax.set_title(title)
+
+        ax.legend(loc="lower right")
 
-        plt.legend(loc="lower right")
+    def downsample(self, max_points=1000, tolerance=1e-4):
+        """
+        returns a copy of the ROC curve reduced to at most max_points
+        points (at least 2) that preserve the area under the curve best;
+        raises a ValueError, if the AUC still differs by more than the
+        tolerance (if not None)
+        """
+        assert(max_points >= 2)
+
+        d = self.dict
+        fpr = np.asarray(d["fpr"], dtype=np.float64)
+        tpr = np.asarray(d["tpr"], dtype=np.float64)
+        idx = _simplify_curve(fpr, tpr, max_points)
+
+        if (tolerance is not None) and (len(idx) < len(fpr)):
+            error = auc(fpr[idx], tpr[idx]) - auc(fpr, tpr)
+            if abs(error) > tolerance:
+                raise ValueError(
+                    "downsampling '{}' to {} points changes the AUC by "
+                    "{:.2e}".format(d["name"], len(idx), error)
+                )
+
+        roc = RocCurve(name=d["name"])
+        roc._fpr, roc._tpr = fpr[idx], tpr[idx]
+        roc._thresholds = (
+            np.asarray(d["thresholds"])[idx]
+            if d["thresholds"] is not None else None
+        )
+
+        return roc
 
-    def save(self, filename):
+    def save(self, filename, max_points=None, tolerance=1e-4):
         """
-        save given ROC curve as .json file
+        save given ROC curve as .json file or as compact binary .npz file
+        (depending on the extension), optionally downsampled to at most
+        max_points points (see downsample)
         """
         log.debug("saving ROC curve to '{}'...".format(filename))
+        roc = self
+        if max_points is not None:
+            roc = self.downsample(max_points, tolerance)
+
+        d = roc.dict
+        if os.path.splitext(filename)[1] == ".npz":
+            arrays = {
+                k: np.asarray(d[k])
+                for k in ("fpr", "tpr", "thresholds")
+                if d[k] is not None
+            }
+            np.savez_compressed(filename, name=np.array(d["name"]), **arrays)
+            return
+
         with open(filename, "w") as f:
-            json.dump(self.dict, f)
+            json.dump({
+                k: np.asarray(v).tolist() if k != "name" else v
+                for k, v in d.items()
+                if v is not None
+            }, f)
 
     def load(self, filename):
         """
-        save given ROC curve as .json file
+        load given ROC curve from .json file or .npz file
         """
         log.debug("loading ROC curve from '{}'...".format(filename))
-        with open(filename, "r") as f:
-            d = json.load(f)
-            self._fpr = d["fpr"]
-            self._tpr = d["tpr"]
-            self._name = d["name"]
+        if os.path.splitext(filename)[1] == ".npz":
+            with np.load(filename, allow_pickle=False) as d:
+                d = {k: d[k] for k in d.files}
+                d["name"] = str(d["name"])
+        else:
+            with open(filename, "r") as f:
+                d = json.load(f)
+
+        self._fpr = np.asarray(d["fpr"], dtype=np.float64)
+        self._tpr = np.asarray(d["tpr"], dtype=np.float64)
+        self._thresholds = (
+            np.asarray(d["thresholds"], dtype=np.float64)
+            if "thresholds" in d else None
+        )
+        self._name = d["name"]
+
+
+class StreamingRocCurve(RocCurve):
+    """
+    ROC curve that is computed incrementally from batches of labels and
+    scores in constant memory by counting the positives and negatives in
+    n_bins fixed-width score bins over the score_range (scores outside the
+    range are counted in the outermost bins); histograms with the same
+    bins can be merged
+    """
+    def __init__(
+        self, n_bins=10000, score_range=(0.0, 1.0), pos_label=1, name="ROC"
+    ):
+        RocCurve.__init__(self, name=name)
+
+        self._n_bins = n_bins
+        self._score_range = score_range
+        self._pos_label = pos_label
+        self._pos = np.zeros(n_bins, dtype=np.int64)
+        self._neg = np.zeros(n_bins, dtype=np.int64)
+        self._is_dirty = True
+
+    def update(self, labels, scores):
+        """
+        add a batch of labels and scores
+        """
+        labels = np.asarray(labels)
+        scores = np.asarray(scores, dtype=np.float64)
+        assert(len(labels) == len(scores))
+
+        lo, hi = self._score_range
+        bins = ((scores - lo) * (self._n_bins / (hi - lo))).astype(np.int64)
+        np.clip(bins, 0, self._n_bins - 1, out=bins)
+
+        is_pos = labels == self._pos_label
+        self._pos += np.bincount(bins[is_pos], minlength=self._n_bins)
+        self._neg += np.bincount(bins[~is_pos], minlength=self._n_bins)
+        self._is_dirty = True
+
+    def merge(self, other):
+        """
+        add the counts of another streaming ROC curve with the same bins
+        """
+        assert(self._n_bins == other._n_bins)
+        assert(tuple(self._score_range) == tuple(other._score_range))
+
+        self._pos += other._pos
+        self._neg += other._neg
+        self._is_dirty = True
+
+    def compute_roc_curve(self, labels=None, scores=None):
+        """
+        compute the ROC curve from the histograms
+        (after adding labels and scores, if provided)
+        """
+        if (labels is not None) and (scores is not None):
+            self.update(labels, scores)
+
+        no_pos, no_neg = self._pos.sum(), self._neg.sum()
+        if (no_pos == 0) or (no_neg == 0):
+            raise ValueError(
+                "ROC curve requires positive and negative samples"
+            )
+
+        # thresholds are the lower bin edges in descending order,
+        # empty bins are dropped
+        edges = np.linspace(*self._score_range, num=self._n_bins + 1)[:-1]
+        nonempty = ((self._pos + self._neg) > 0)[::-1]
+        tps = np.cumsum(self._pos[::-1])[nonempty]
+        fps = np.cumsum(self._neg[::-1])[nonempty]
+
+        self._tpr = np.r_[0.0, tps / float(no_pos)]
+        self._fpr = np.r_[0.0, fps / float(no_neg)]
+        self._thresholds = np.r_[np.inf, edges[::-1][nonempty]]
+        self._is_dirty = False
+
+    def _ensure_curve(self):
+        """
+        recompute the curve, if new data has been added
+        """
+        if self._is_dirty:
+            self.compute_roc_curve()
+
+    def auc(self, max_fpr=1.0):
+        """
+        compute (bounded-)AUC for ROC curve
+        """
+        self._ensure_curve()
+
+        return RocCurve.auc(self, max_fpr)
+
+    def auc_error_bound(self, max_fpr=1.0):
+        """
+        returns the maximum absolute error of the (bounded-)AUC caused
+        by the binning i.e. by the unknown order within each bin
+        """
+        no_pos, no_neg = self._pos.sum(), self._neg.sum()
+        error = 0.5 * np.dot(
+            self._pos.astype(np.float64), self._neg
+        ) / (float(no_pos) * no_neg)
+
+        if (max_fpr is None) or (max_fpr == 1.0):
+            return error
+
+        # error after McClish correction of the partial area
+        min_area = 0.5 * max_fpr ** 2
+        return 0.5 * error / (max_fpr - min_area)
+
+    def plot(
+        self, ax, max_fpr=1.0, title=None, random_line=True, rasterized=None
+    ):
+        self._ensure_curve()
+
+        RocCurve.plot(self, ax, max_fpr, title, random_line, rasterized)
+
+    @property
+    def dict(self):
+        self._ensure_curve()
+
+        return RocCurve.dict.fget(self)
+
+
+# labels shared by the ROC evaluation worker processes
+_shared_labels = None
+
+
+def _init_roc_worker(labels):
+    """
+    set the shared labels once per worker process
+    """
+    global _shared_labels
+    _shared_labels = labels
+
+
+def _compute_roc(scores, labels=None):
+    """
+    returns false positive rates, true positive rates and thresholds
+    for the given scores (and the shared labels, if no labels given)
+    """
+    return roc_curve(_shared_labels if labels is None else labels, scores)
+
+
+def evaluate_rocs(
+    labels, scores, no_processes=1, max_points=None, tolerance=1e-4
+):
+    """
+    computes the ROC curves of multiple models on the same labels, given
+    a dictionary of model name and scores, in parallel on no_processes
+    worker processes (the labels are only sent once to each worker);
+    returns an ordered dictionary of model name and RocCurve, optionally
+    downsampled to at most max_points points (see RocCurve.downsample)
+    """
+    labels = np.asarray(labels)
+    names = list(scores.keys())
+    for name in names:
+        assert(len(scores[name]) == len(labels))
+
+    if no_processes > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+            no_processes, initializer=_init_roc_worker, initargs=(labels, )
+        ) as ex:
+            curves = list(ex.map(_compute_roc, [scores[n] for n in names]))
+    else:
+        curves = [_compute_roc(scores[name], labels) for name in names]
+
+    rocs = collections.OrderedDict()
+    for name, (fpr, tpr, thresholds) in zip(names, curves):
+        roc = RocCurve(name=name)
+        roc._fpr, roc._tpr, roc._thresholds = fpr, tpr, thresholds
+        if max_points is not None:
+            roc = roc.downsample(max_points, tolerance)
+        rocs[name] = roc
+
+    return rocs
 
 
 def plot_rocs(
     rocs, targetdir, filename="roc", max_fpr=None, random_line=True,
-    title=None, figsize=(10, 8), ext="pdf"
+    title=None, figsize=(10, 8), ext="pdf", max_points=5000,
+    rasterize_points=10000, use_pyplot=True
 ):
     """
-    plot multiple ROC curves into one figure
-    list of rocs must contain dictionaries with the following keys:
-        "fpr", "tpr", "auc_score", "label"
+    plot multiple ROC curves (RocCurve objects) into one figure; dense
+    curves are downsampled to at most max_points (if not None) and curves
+    that still have more than rasterize_points points are rasterized
     """
     if isinstance(rocs, RocCurve):
         # convert single roc dict into list
@@ -130,9 +488,23 @@ def plot_rocs(
     with FigureContext(
         targetdir=targetdir, filename=filename, title=title,
         xlabel="False Positive Rate", ylabel="True Positive Rate",
-        rotate_xticks=False, ext=ext, figsize=figsize
+        rotate_xticks=False, ext=ext, figsize=figsize, use_pyplot=use_pyplot
     ) as ax:
-        for roc in rocs:
-            roc.plot(ax, max_fpr, title, random_line)
+        for no, roc in enumerate(rocs):
+            if (max_points is not None) and (
+                len(roc.dict["fpr"]) > max_points
+            ):
+                # only for display, the area error is not relevant
+                roc = roc.downsample(max_points, tolerance=None)
+
+            rasterized = (
+                (rasterize_points is not None) and
+                (len(roc.dict["fpr"]) > rasterize_points)
+            )
+
+            # draw the random predictions line only once
+            roc.plot(
+                ax, max_fpr, title, random_line and (no == 0), rasterized
+            )
 
-        return plt.gcf()
+        return ax.figure
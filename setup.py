@@ -41,4 +41,7 @@ setup(
         "requests", "ujson", "numpy", "scipy", "sklearn",
         "inflect", "nltk", "beautifulsoup4"
     ],
+    extras_require={
+        "zstd": ["zstandard"],
+    },
 )
@@ -0,0 +1,93 @@
+import time
+import queue
+import threading
+
+from dstools.queueutils import ThreadedWorkerQueue
+
+
+def _stop_in_thread(q, timeout=10):
+    """
+    calls stop_workers in a separate thread and returns True, if it
+    finished within the timeout
+    """
+    t = threading.Thread(target=q.stop_workers)
+    t.daemon = True
+    t.start()
+    t.join(timeout)
+
+    return not t.is_alive()
+
+
+def test_stop_workers_with_pending_items():
+    processed = []
+    q = ThreadedWorkerQueue(
+        lambda item: (time.sleep(0.001), processed.append(item)),
+        no_threads=2
+    )
+    for item in range(200):
+        q.put(item)
+
+    assert _stop_in_thread(q)
+    assert sorted(processed) == list(range(200))
+    assert q.is_worker_running() is False
+
+
+def test_stop_workers_with_autoscaler():
+    processed = []
+    q = ThreadedWorkerQueue(
+        lambda item: (time.sleep(0.001), processed.append(item)),
+        no_threads=1, max_threads=4, max_wait=0.0, autoscale_interval=0.01
+    )
+    for item in range(200):
+        q.put(item)
+    time.sleep(0.05)
+
+    assert _stop_in_thread(q)
+    assert sorted(processed) == list(range(200))
+    assert q.metrics["workers"] == 0
+
+
+def test_ordered_results_skip_rejected_items():
+    q = ThreadedWorkerQueue(
+        lambda item: item, no_threads=1, auto_start_workers=False,
+        maxsize=1, collect_results=True, ordered=True
+    )
+    for item in range(5):
+        try:
+            q.put(item, block=False)
+
+        except queue.Full:
+            pass
+
+    q.start_workers()
+    q.put(5)
+    q.join()
+
+    assert list(q.results()) == [0, 5]
+
+
+def test_batch_with_wrong_number_of_results():
+    q = ThreadedWorkerQueue(
+        lambda items: items[:1], batch_size=4, auto_start_workers=False,
+        collect_results=True, ordered=True
+    )
+    for item in range(10):
+        q.put(item)
+
+    q.start_workers()
+    assert _stop_in_thread(q)
+    assert list(q.results()) == []
+    assert sorted(item for item, _ in q.errors) == list(range(10))
+
+
+def test_errors_are_bounded():
+    def fail(item):
+        raise ValueError(item)
+
+    q = ThreadedWorkerQueue(fail, max_errors=5)
+    for item in range(20):
+        q.put(item)
+    q.join()
+
+    assert len(q.errors) == 5
+    assert q.metrics["failed"] == 20